@@ -0,0 +1,84 @@
+"""Semantic answer cache.
+
+Answers are grouped by scope — the user plus the exact set of selected
+documents — and matched on the cosine similarity of the question embedding
+(embeddings are normalised, so a dot product is enough). Entries carry the
+user's corpus version (`app.corpus`) they were produced against; callers
+pass the current one, so answers from before an ingest or delete — made in
+any API process — are never served.
+"""
+import threading
+import time
+
+from app.core.cache import TTLCache
+from app.core.config import (
+    ANSWER_CACHE_ENABLED,
+    ANSWER_CACHE_THRESHOLD,
+    ANSWER_CACHE_TTL,
+    ANSWER_CACHE_MAX_SCOPES,
+    ANSWER_CACHE_PER_SCOPE,
+)
+
+
+class _Entry:
+    __slots__ = ("vector", "answer", "sources", "version", "created")
+
+    def __init__(self, vector: list, answer: str, sources: list, version: float):
+        self.vector = vector
+        self.answer = answer
+        self.sources = sources
+        self.version = version
+        self.created = time.monotonic()
+
+
+_scopes = TTLCache(ANSWER_CACHE_MAX_SCOPES, ANSWER_CACHE_TTL)  # (user_id, doc set) → [_Entry]
+_lock = threading.Lock()
+_counters = {"hits": 0, "misses": 0}
+
+
+def _scope(user_id: str, doc_ids) -> tuple:
+    return user_id, frozenset(doc_ids) if doc_ids else None
+
+
+def lookup(user_id: str, doc_ids, vector: list, version: float):
+    """Return (answer, sources) for a near-identical earlier question at `version`, else None."""
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    entries = _scopes.get(_scope(user_id, doc_ids)) or []
+    cutoff = time.monotonic() - ANSWER_CACHE_TTL
+    best, best_sim = None, ANSWER_CACHE_THRESHOLD
+    for e in entries:
+        if e.version != version or e.created < cutoff:
+            continue
+        sim = sum(a * b for a, b in zip(vector, e.vector))
+        if sim >= best_sim:
+            best, best_sim = e, sim
+    with _lock:
+        _counters["hits" if best else "misses"] += 1
+    return (best.answer, best.sources) if best else None
+
+
+def store(user_id: str, doc_ids, vector: list, answer: str, sources: list, version: float) -> None:
+    """Remember an answer computed against corpus `version`."""
+    if not ANSWER_CACHE_ENABLED:
+        return
+    key = _scope(user_id, doc_ids)
+    with _lock:
+        entries = _scopes.get(key) or []
+        if any(e.version > version for e in entries):
+            return  # the corpus changed while this answer was generated
+        entries = [e for e in entries if e.version == version]
+        entries.append(_Entry(list(vector), answer, sources, version))
+        _scopes.set(key, entries[-ANSWER_CACHE_PER_SCOPE:])
+
+
+def stats() -> dict:
+    with _lock:
+        hits, misses = _counters["hits"], _counters["misses"]
+    total = hits + misses
+    return {
+        "scopes": len(_scopes),
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": hits / total if total else 0.0,
+    }
@@ -0,0 +1,203 @@
+"""Batch question answering jobs.
+
+A job is a `batch_jobs` record plus one `batch_results` row per question;
+nothing is written to `chat_sessions`. Jobs run as asyncio tasks in the API
+process that accepted them. All questions are embedded in one bulk batch,
+searches run a few at a time in the shared search pool, and LLM calls go
+through the gateway with at most BATCH_LLM_CONCURRENCY per job.
+
+Like ingestion jobs, a running job holds a lease its task keeps renewing.
+A clean shutdown hands its jobs' leases back at once; when a process dies
+they lapse instead. Every API process polls for such jobs and resumes them,
+skipping questions that already have a result.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.core.config import (
+    BATCH_SEARCH_CONCURRENCY,
+    BATCH_LLM_CONCURRENCY,
+    BATCH_LEASE_SECONDS,
+    CONTEXT_CANDIDATES,
+)
+from app.core.database import get_db
+from app.core.metrics import span
+from app import answer_cache, corpus, llm_gateway
+from app.embedding_service import get_embeddings
+from app.rag_engine import asearch
+from app.routers.chat import build_messages, build_sources
+
+_LLM_RETRIES = 5  # 429s from the gateway are waited out, not reported
+
+_tasks: dict = {}     # job id → asyncio.Task
+_poller: asyncio.Task = None
+_progress: dict = {}  # job id → asyncio.Event, set whenever a result is stored
+
+
+def _pulse(job_id: str) -> None:
+    event = _progress.pop(job_id, None)
+    if event is not None:
+        event.set()
+
+
+def watch(job_id: str) -> asyncio.Event:
+    """An event set by the next result this process stores for the job."""
+    return _progress.setdefault(job_id, asyncio.Event())
+
+
+async def _generate(user_id: str, messages: list) -> str:
+    for attempt in range(_LLM_RETRIES):
+        try:
+            return await llm_gateway.generate(user_id, messages)
+        except HTTPException as e:
+            if e.status_code != 429 or attempt == _LLM_RETRIES - 1:
+                raise
+            await asyncio.sleep(int(e.headers.get("Retry-After", "1")))
+
+
+async def _answer(db, job: dict, index: int, vec: list, search_slots, llm_slots) -> None:
+    job_id, user_id, doc_ids = str(job["_id"]), job["user_id"], job.get("document_ids")
+    question = job["questions"][index]
+    result = {"job_id": job_id, "index": index, "question": question}
+    try:
+        version = await corpus.version(db, user_id)
+        cached = answer_cache.lookup(user_id, doc_ids, vec, version)
+        if cached:
+            answer, sources = cached
+        else:
+            async with search_slots:
+                hits = await asearch(
+                    question, user_id, doc_ids, top_k=CONTEXT_CANDIDATES, query_vec=vec, corpus_version=version
+                )
+            messages, hits = await build_messages(question, hits)
+            async with llm_slots:
+                answer = await _generate(user_id, messages)
+            sources = [src.model_dump() for src in await build_sources(db, user_id, hits)]
+        result.update(answer=answer, sources=sources)
+    except asyncio.TimeoutError:
+        result["error"] = "Document search timed out"
+    except HTTPException as e:
+        result["error"] = e.detail
+    except Exception as e:
+        print(f"Batch question error ({job_id}#{index}): {e}")
+        result["error"] = "Generation failed"
+
+    result["created_at"] = datetime.utcnow()
+    try:
+        await db["batch_results"].insert_one(result)
+    except DuplicateKeyError:
+        return  # already answered before a resume
+    counter = "failed" if "error" in result else "completed"
+    await db["batch_jobs"].update_one({"_id": job["_id"]}, {"$inc": {counter: 1}})
+    _pulse(job_id)
+
+
+async def _heartbeat(db, job_id, task: asyncio.Task) -> None:
+    while True:
+        await asyncio.sleep(BATCH_LEASE_SECONDS / 3)
+        lease = datetime.utcnow() + timedelta(seconds=BATCH_LEASE_SECONDS)
+        res = await db["batch_jobs"].update_one(
+            {"_id": job_id, "status": "running"}, {"$set": {"lease_until": lease}}
+        )
+        if not res.matched_count:
+            task.cancel()  # deleted (possibly through another API process)
+            return
+
+
+async def _run(db, job: dict) -> None:
+    job_id = str(job["_id"])
+    heartbeat = asyncio.create_task(_heartbeat(db, job["_id"], asyncio.current_task()))
+    try:
+        answered = {r["index"] async for r in db["batch_results"].find({"job_id": job_id}, {"index": 1})}
+        todo = [i for i in range(len(job["questions"])) if i not in answered]
+        if todo:
+            # One bulk-priority batch: interactive queries still jump ahead of it.
+            with span("batch_embed"):
+                vectors = await asyncio.to_thread(
+                    get_embeddings().embed_documents, [job["questions"][i] for i in todo]
+                )
+            search_slots = asyncio.Semaphore(BATCH_SEARCH_CONCURRENCY)
+            llm_slots = asyncio.Semaphore(BATCH_LLM_CONCURRENCY)
+            await asyncio.gather(*(
+                _answer(db, job, i, vec, search_slots, llm_slots) for i, vec in zip(todo, vectors)
+            ))
+        update = {"status": "done"}
+    except asyncio.CancelledError:
+        raise  # shutdown (lease lapses, job resumes) or deletion
+    except Exception as e:
+        print(f"Batch job error ({job_id}): {e}")
+        update = {"status": "error", "error": str(e)}
+    finally:
+        heartbeat.cancel()
+        _tasks.pop(job_id, None)
+    await db["batch_jobs"].update_one(
+        {"_id": job["_id"]},
+        {"$set": {**update, "finished_at": datetime.utcnow()}, "$unset": {"lease_until": ""}},
+    )
+    _pulse(job_id)
+    print(f"Batch job {job_id} {update['status']}")
+
+
+def start(db, job: dict) -> None:
+    """Run a job (already marked running with a fresh lease) in this process."""
+    _tasks[str(job["_id"])] = asyncio.create_task(_run(db, job))
+
+
+def cancel(job_id: str) -> None:
+    task = _tasks.get(job_id)
+    if task is not None:
+        task.cancel()
+
+
+async def _resume(db) -> None:
+    resumed = 0
+    while True:
+        now = datetime.utcnow()
+        job = await db["batch_jobs"].find_one_and_update(
+            {"status": "running", "lease_until": {"$lt": now}},
+            {"$set": {"lease_until": now + timedelta(seconds=BATCH_LEASE_SECONDS)}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if job is None:
+            break
+        start(db, job)
+        resumed += 1
+    if resumed:
+        print(f"Resumed {resumed} batch job(s)")
+
+
+async def _poll(db) -> None:
+    while True:
+        await asyncio.sleep(BATCH_LEASE_SECONDS)
+        try:
+            await _resume(db)
+        except Exception as e:
+            print(f"Batch resume error: {e}")
+
+
+async def resume_jobs() -> None:
+    """Pick up jobs whose process stopped before finishing them, now and whenever a lease lapses."""
+    global _poller
+    db = get_db()
+    await _resume(db)
+    _poller = asyncio.create_task(_poll(db))
+
+
+async def stop_jobs() -> None:
+    """Stop this process's jobs and release their leases so the next process resumes them at once."""
+    if _poller is not None:
+        _poller.cancel()
+    ids = [ObjectId(job_id) for job_id in _tasks]
+    tasks = list(_tasks.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    if ids:
+        await get_db()["batch_jobs"].update_many(
+            {"_id": {"$in": ids}, "status": "running"}, {"$set": {"lease_until": datetime.utcnow()}}
+        )
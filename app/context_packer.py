@@ -0,0 +1,140 @@
+"""Token-budgeted context assembly.
+
+Retrieved chunks overlap by design (chunk_overlap=200) and neighbouring hits
+from the same page often arrive together. The packer merges those into one
+passage per contiguous span, orders passages by their best hit's rank and
+adds them until CONTEXT_TOKEN_BUDGET is spent, counting with the configured
+tokenizer.
+"""
+import threading
+
+from app.core.config import CONTEXT_TOKEN_BUDGET, CONTEXT_TOKENIZER
+
+SEPARATOR = "\n\n---\n\n"
+
+_tokenizer = None
+_stats = {"requests": 0, "naive_tokens": 0, "packed_tokens": 0}
+_stats_lock = threading.Lock()
+
+
+def warm_up() -> None:
+    """Load the CONTEXT_TOKENIZER tokenizer (called once at application startup)."""
+    global _tokenizer
+    try:
+        from tokenizers import Tokenizer
+        _tokenizer = Tokenizer.from_pretrained(CONTEXT_TOKENIZER)
+        print(f"✅ Tokenizer {CONTEXT_TOKENIZER} loaded")
+    except Exception as e:
+        print(f"Tokenizer {CONTEXT_TOKENIZER} unavailable ({e}); estimating 4 chars per token")
+
+
+def _get_tokenizer():
+    """The loaded tokenizer, or None while it is loading or if it failed; requests never wait for it."""
+    return _tokenizer
+
+
+def count_tokens(text: str) -> int:
+    tok = _get_tokenizer()
+    if tok:
+        return len(tok.encode(text, add_special_tokens=False).ids)
+    return (len(text) + 3) // 4
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    tok = _get_tokenizer()
+    if tok:
+        enc = tok.encode(text, add_special_tokens=False)
+        if len(enc.ids) <= max_tokens:
+            return text
+        return text[:enc.offsets[max_tokens - 1][1]] + "…"
+    return text if len(text) <= max_tokens * 4 else text[:max_tokens * 4] + "…"
+
+
+def _suffix_prefix_overlap(a: str, b: str) -> int:
+    """Length of the longest suffix of `a` that is a prefix of `b`."""
+    for n in range(min(len(a), len(b)), 0, -1):
+        if a.endswith(b[:n]):
+            return n
+    return 0
+
+
+class _Passage:
+    __slots__ = ("text", "start", "end", "rank", "hits")
+
+    def __init__(self, hit, rank: int):
+        self.text = hit.page_content
+        self.start = hit.metadata.get("start_index")
+        self.end = None if self.start is None else self.start + len(self.text)
+        self.rank = rank
+        self.hits = [hit]
+
+    def absorb(self, other: "_Passage") -> bool:
+        """Append `other` if it overlaps or directly follows this passage."""
+        if self.start is not None and other.start is not None:
+            if other.start > self.end:
+                return False
+            self.text += other.text[self.end - other.start:] if other.end > self.end else ""
+            self.end = max(self.end, other.end)
+        else:
+            overlap = _suffix_prefix_overlap(self.text, other.text)
+            if overlap < 50:
+                return False
+            self.text += other.text[overlap:]
+        self.rank = min(self.rank, other.rank)
+        self.hits.extend(other.hits)
+        return True
+
+
+def _passages(hits: list) -> list:
+    groups: dict = {}
+    for rank, hit in enumerate(hits):
+        key = (hit.metadata.get("doc_id"), hit.metadata.get("page"))
+        groups.setdefault(key, []).append(_Passage(hit, rank))
+
+    merged = []
+    for group in groups.values():
+        group.sort(key=lambda p: (p.start is None, p.start or 0))
+        current = group[0]
+        for p in group[1:]:
+            if not current.absorb(p):
+                merged.append(current)
+                current = p
+        merged.append(current)
+    return sorted(merged, key=lambda p: p.rank)
+
+
+def pack(hits: list, budget: int = CONTEXT_TOKEN_BUDGET):
+    """Return (context, used_hits, stats) for hits ordered best-first."""
+    if not hits:
+        return "", [], {"naive_tokens": 0, "packed_tokens": 0, "saved_tokens": 0}
+
+    sep_tokens = count_tokens(SEPARATOR)
+    parts, used, spent = [], [], 0
+    for p in _passages(hits):
+        cost = count_tokens(p.text) + (sep_tokens if parts else 0)
+        if spent + cost <= budget:
+            parts.append(p.text)
+        elif not parts:
+            # Even the best passage is over budget: send as much of it as fits.
+            parts.append(_truncate(p.text, budget))
+            cost = budget
+        else:
+            continue
+        used.extend(p.hits)
+        spent += cost
+
+    context = SEPARATOR.join(parts)
+    naive = count_tokens(SEPARATOR.join(h.page_content for h in hits))
+    packed = count_tokens(context)
+    with _stats_lock:
+        _stats["requests"] += 1
+        _stats["naive_tokens"] += naive
+        _stats["packed_tokens"] += packed
+    return context, used, {"naive_tokens": naive, "packed_tokens": packed, "saved_tokens": naive - packed}
+
+
+def stats() -> dict:
+    with _stats_lock:
+        s = dict(_stats)
+    s["saved_tokens"] = s["naive_tokens"] - s["packed_tokens"]
+    return s
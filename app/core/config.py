@@ -14,3 +14,94 @@ ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
 GROQ_API_KEY: str = os.getenv("GROQ_API_KEY", "")
 UPLOAD_DIR: str = "./uploads"
 CHROMA_DIR: str = "./chroma_db"
+
+# ── Vector store registry ─────────────────────────────────────────────────────
+CHROMA_MAX_OPEN_STORES: int = int(os.getenv("CHROMA_MAX_OPEN_STORES", "64"))
+# Bound on files under the open stores' directories (SQLite + HNSW segments), well below `ulimit -n`.
+CHROMA_MAX_OPEN_FILES: int = int(os.getenv("CHROMA_MAX_OPEN_FILES", "512"))
+CHROMA_STORE_IDLE_TTL: int = int(os.getenv("CHROMA_STORE_IDLE_TTL", "900"))  # seconds
+# "per_user": one Chroma directory per account; "sharded": users hashed into VECTOR_SHARDS
+# shared collections (migrate with `python -m app.migrate_vector_layout`).
+VECTOR_STORE_LAYOUT: str = os.getenv("VECTOR_STORE_LAYOUT", "per_user")
+VECTOR_SHARDS: int = int(os.getenv("VECTOR_SHARDS", "16"))
+
+# ── Async RAG pipeline ────────────────────────────────────────────────────────
+RAG_SEARCH_WORKERS: int = int(os.getenv("RAG_SEARCH_WORKERS", "4"))
+RAG_SEARCH_TIMEOUT: float = float(os.getenv("RAG_SEARCH_TIMEOUT", "15"))  # seconds
+RAG_MAX_FETCH_K: int = int(os.getenv("RAG_MAX_FETCH_K", "50"))
+LLM_TIMEOUT: float = float(os.getenv("LLM_TIMEOUT", "60"))  # seconds
+
+# ── LLM gateway ───────────────────────────────────────────────────────────────
+LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))  # provider calls in flight
+LLM_MAX_QUEUED: int = int(os.getenv("LLM_MAX_QUEUED", "64"))  # waiting for a slot, all users
+LLM_MAX_QUEUED_PER_USER: int = int(os.getenv("LLM_MAX_QUEUED_PER_USER", "4"))
+LLM_QUEUE_TIMEOUT: float = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))  # seconds
+LLM_RETRY_AFTER: int = int(os.getenv("LLM_RETRY_AFTER", "5"))  # provider 429 without a Retry-After
+
+# ── Ingestion queue ───────────────────────────────────────────────────────────
+INGEST_WORKERS: int = int(os.getenv("INGEST_WORKERS", "2"))            # concurrent jobs
+INGEST_PARSE_PROCESSES: int = int(os.getenv("INGEST_PARSE_PROCESSES", "2"))
+INGEST_MAX_ATTEMPTS: int = int(os.getenv("INGEST_MAX_ATTEMPTS", "3"))
+INGEST_RETRY_BASE: float = float(os.getenv("INGEST_RETRY_BASE", "10"))  # seconds, doubles per attempt
+INGEST_LEASE_SECONDS: int = int(os.getenv("INGEST_LEASE_SECONDS", "60"))
+INGEST_POLL_SECONDS: float = float(os.getenv("INGEST_POLL_SECONDS", "5"))
+INGEST_PAGE_BATCH: int = int(os.getenv("INGEST_PAGE_BATCH", "20"))     # pages parsed + embedded per step
+
+# ── Embedding micro-batcher ───────────────────────────────────────────────────
+EMBED_MAX_BATCH: int = int(os.getenv("EMBED_MAX_BATCH", "64"))
+EMBED_MAX_WAIT_MS: float = float(os.getenv("EMBED_MAX_WAIT_MS", "5"))
+
+# ── Hybrid retrieval ──────────────────────────────────────────────────────────
+RAG_HYBRID: bool = os.getenv("RAG_HYBRID", "true").lower() in ("1", "true", "yes")
+RAG_RRF_K: int = int(os.getenv("RAG_RRF_K", "60"))
+LEXICAL_DIR: str = os.path.join(CHROMA_DIR, "lexical")
+
+# ── Document routing (unscoped queries) ───────────────────────────────────────
+RAG_ROUTING: bool = os.getenv("RAG_ROUTING", "true").lower() in ("1", "true", "yes")
+RAG_ROUTE_TOP_DOCS: int = int(os.getenv("RAG_ROUTE_TOP_DOCS", "8"))  # documents searched per query
+RAG_ROUTE_REPRESENTATIVES: int = int(os.getenv("RAG_ROUTE_REPRESENTATIVES", "3"))  # chunks kept per document
+
+# ── In-process caches ─────────────────────────────────────────────────────────
+DOC_CACHE_MAX_ENTRIES: int = int(os.getenv("DOC_CACHE_MAX_ENTRIES", "10000"))
+DOC_CACHE_TTL: int = int(os.getenv("DOC_CACHE_TTL", "300"))  # seconds
+PRINCIPAL_CACHE_MAX_ENTRIES: int = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "10000"))
+PRINCIPAL_CACHE_TTL: int = int(os.getenv("PRINCIPAL_CACHE_TTL", "60"))  # seconds
+
+# ── Password hashing ──────────────────────────────────────────────────────────
+BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_PENDING: int = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "16"))
+PASSWORD_HASH_QUEUE_TIMEOUT: float = float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", "5"))  # seconds
+
+# ── Semantic answer cache ─────────────────────────────────────────────────────
+ANSWER_CACHE_ENABLED: bool = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+ANSWER_CACHE_THRESHOLD: float = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))  # cosine similarity
+ANSWER_CACHE_TTL: int = int(os.getenv("ANSWER_CACHE_TTL", "3600"))  # seconds
+ANSWER_CACHE_MAX_SCOPES: int = int(os.getenv("ANSWER_CACHE_MAX_SCOPES", "5000"))
+ANSWER_CACHE_PER_SCOPE: int = int(os.getenv("ANSWER_CACHE_PER_SCOPE", "50"))
+
+# ── Context packing ───────────────────────────────────────────────────────────
+CONTEXT_TOKEN_BUDGET: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+CONTEXT_CANDIDATES: int = int(os.getenv("CONTEXT_CANDIDATES", "10"))  # chunks retrieved before packing
+# Tokenizer of the Groq model (llama-3.3-70b-versatile); this mirror is not gated on the Hub.
+CONTEXT_TOKENIZER: str = os.getenv("CONTEXT_TOKENIZER", "unsloth/Llama-3.3-70B-Instruct")
+
+# ── Embedding backend ─────────────────────────────────────────────────────────
+EMBED_BACKEND: str = os.getenv("EMBED_BACKEND", "sentence-transformers")  # | torch-int8 | onnx-int8
+EMBED_MODEL: str = os.getenv("EMBED_MODEL", "all-MiniLM-L6-v2")
+EMBED_ONNX_FILE: str = os.getenv("EMBED_ONNX_FILE", "onnx/model_qint8_avx2.onnx")
+EMBED_SERVER_SOCKET: str = os.getenv("EMBED_SERVER_SOCKET", "")  # e.g. /tmp/docmind-embed.sock
+EMBED_SERVER_RETRY_SECONDS: float = float(os.getenv("EMBED_SERVER_RETRY_SECONDS", "30"))
+
+# ── Batch question answering ──────────────────────────────────────────────────
+BATCH_MAX_QUESTIONS: int = int(os.getenv("BATCH_MAX_QUESTIONS", "500"))
+BATCH_SEARCH_CONCURRENCY: int = int(os.getenv("BATCH_SEARCH_CONCURRENCY", "2"))  # leaves search workers for chat
+BATCH_LLM_CONCURRENCY: int = int(os.getenv("BATCH_LLM_CONCURRENCY", "3"))  # per job, within the LLM gateway
+BATCH_LEASE_SECONDS: int = int(os.getenv("BATCH_LEASE_SECONDS", "60"))
+
+# ── Document status events ────────────────────────────────────────────────────
+DOC_EVENTS_KEEPALIVE: float = float(os.getenv("DOC_EVENTS_KEEPALIVE", "15"))  # seconds
+DOC_EVENTS_QUEUE: int = int(os.getenv("DOC_EVENTS_QUEUE", "256"))  # per connection
+
+# ── Observability ─────────────────────────────────────────────────────────────
+SLOW_REQUEST_MS: float = float(os.getenv("SLOW_REQUEST_MS", "0"))  # 0 = slow-request log off
@@ -30,7 +30,12 @@ async def connect_db() -> None:
     await _db["users"].create_index("email", unique=True)
     await _db["users"].create_index("username", unique=True)
     await _db["documents"].create_index("user_id")
+    await _db["documents"].create_index([("user_id", 1), ("sha256", 1)])
     await _db["chat_sessions"].create_index("user_id")
+    await _db["chat_sessions"].create_index([("user_id", 1), ("updated_at", -1)])
+    await _db["chat_messages"].create_index([("session_id", 1), ("seq", 1)], unique=True)
+    await _db["batch_jobs"].create_index([("user_id", 1), ("created_at", -1)])
+    await _db["batch_results"].create_index([("job_id", 1), ("index", 1)], unique=True)
     print("✅ MongoDB connected and indexes ready")
 
 
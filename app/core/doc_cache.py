@@ -0,0 +1,44 @@
+from bson import ObjectId
+
+from app.core.cache import TTLCache
+from app.core.config import DOC_CACHE_MAX_ENTRIES, DOC_CACHE_TTL
+
+# (user_id, doc_id) → the few document fields the chat path needs.
+_cache = TTLCache(DOC_CACHE_MAX_ENTRIES, DOC_CACHE_TTL)
+_PROJECTION = {"original_name": 1, "user_id": 1, "status": 1}
+
+
+async def get_doc_meta(db, user_id: str, doc_ids) -> dict:
+    """Return {doc_id: metadata} for the ids this user owns.
+
+    Cached entries are served from memory; the rest come from one `$in` query.
+    Ids that are unknown or belong to someone else are simply absent.
+    """
+    found, missing = {}, []
+    for did in set(doc_ids):
+        meta = _cache.get((user_id, did))
+        if meta is None:
+            missing.append(did)
+        else:
+            found[did] = meta
+
+    oids = [ObjectId(did) for did in missing if ObjectId.is_valid(did)]
+    if oids:
+        cursor = db["documents"].find({"_id": {"$in": oids}, "user_id": user_id}, _PROJECTION)
+        async for d in cursor:
+            did = str(d["_id"])
+            meta = {k: d.get(k) for k in _PROJECTION}
+            _cache.set((user_id, did), meta)
+            found[did] = meta
+    return found
+
+
+def invalidate(user_id: str, doc_id: str = None) -> None:
+    if doc_id is None:
+        _cache.pop_where(lambda key, _: key[0] == user_id)
+    else:
+        _cache.pop((user_id, doc_id))
+
+
+def stats() -> dict:
+    return _cache.stats()
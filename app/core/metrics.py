@@ -0,0 +1,112 @@
+"""Request/stage timing and the Prometheus registry behind `/metrics`.
+
+Wrap any step in `with span("stage"):` — the duration goes into the
+`docmind_stage_seconds` histogram and, when inside a request, into that
+request's breakdown for the slow-request log.
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+
+from app.core.config import SLOW_REQUEST_MS
+
+REGISTRY = CollectorRegistry()
+
+_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+REQUEST_SECONDS = Histogram(
+    "docmind_request_seconds", "HTTP request latency",
+    ["method", "route", "status"], buckets=_LATENCY_BUCKETS, registry=REGISTRY,
+)
+STAGE_SECONDS = Histogram(
+    "docmind_stage_seconds", "Latency of individual pipeline stages",
+    ["stage"], buckets=_LATENCY_BUCKETS, registry=REGISTRY,
+)
+SLOW_REQUESTS = Counter(
+    "docmind_slow_requests", "Requests slower than SLOW_REQUEST_MS", ["route"], registry=REGISTRY,
+)
+EMBED_BATCH_SIZE = Histogram(
+    "docmind_embedding_batch_size", "Texts per embedding batch",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256), registry=REGISTRY,
+)
+EMBED_QUEUE_SECONDS = Histogram(
+    "docmind_embedding_queue_seconds", "Time an embedding request waited for its batch",
+    buckets=_LATENCY_BUCKETS, registry=REGISTRY,
+)
+INGEST_QUEUE_DEPTH = Gauge(
+    "docmind_ingest_queue_depth", "Documents waiting for or undergoing ingestion",
+    ["status"], registry=REGISTRY,
+)
+CACHE_HIT_RATIO = Gauge("docmind_cache_hit_ratio", "Cache hit ratio since start", ["cache"], registry=REGISTRY)
+CACHE_ENTRIES = Gauge("docmind_cache_entries", "Entries currently cached", ["cache"], registry=REGISTRY)
+LLM_IN_FLIGHT = Gauge("docmind_llm_in_flight", "LLM calls currently running", registry=REGISTRY)
+LLM_QUEUED = Gauge("docmind_llm_queued", "LLM calls waiting for a slot", registry=REGISTRY)
+LLM_COALESCED = Counter(
+    "docmind_llm_coalesced", "Requests that joined an identical in-flight LLM call", registry=REGISTRY,
+)
+LLM_REJECTED = Counter(
+    "docmind_llm_rejected", "LLM calls refused with 429", ["reason"], registry=REGISTRY,
+)
+CONTEXT_TOKENS_SAVED = Gauge(
+    "docmind_context_tokens_saved", "Prompt tokens saved by context packing since start", registry=REGISTRY,
+)
+
+_breakdown: contextvars.ContextVar = contextvars.ContextVar("docmind_stage_breakdown", default=None)
+
+
+@contextmanager
+def span(stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(stage).observe(elapsed)
+        stages = _breakdown.get()
+        if stages is not None:
+            stages.append((stage, elapsed))
+
+
+def set_cache_stats(name: str, stats: dict) -> None:
+    CACHE_HIT_RATIO.labels(name).set(stats.get("hit_ratio", 0.0))
+    CACHE_ENTRIES.labels(name).set(stats.get("size", stats.get("scopes", 0)))
+
+
+def render() -> bytes:
+    return generate_latest(REGISTRY)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: request histogram plus optional slow-request log."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stages: list = []
+        token = _breakdown.set(stages)
+        status = {"code": 500}
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _breakdown.reset(token)
+            elapsed = time.perf_counter() - started
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_SECONDS.labels(scope["method"], route, str(status["code"])).observe(elapsed)
+            if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+                SLOW_REQUESTS.labels(route).inc()
+                parts = ", ".join(f"{name}={1000 * secs:.0f}ms" for name, secs in stages)
+                print(f"Slow request {scope['method']} {route} {1000 * elapsed:.0f}ms [{parts}]")
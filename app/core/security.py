@@ -1,5 +1,10 @@
+import asyncio
+import hashlib
+import hmac
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
@@ -7,19 +12,75 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from bson import ObjectId
 
-from app.core.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.core.cache import TTLCache
+from app.core.config import (
+    SECRET_KEY,
+    ALGORITHM,
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    PRINCIPAL_CACHE_MAX_ENTRIES,
+    PRINCIPAL_CACHE_TTL,
+    BCRYPT_ROUNDS,
+    PASSWORD_HASH_WORKERS,
+    PASSWORD_HASH_MAX_PENDING,
+    PASSWORD_HASH_QUEUE_TIMEOUT,
+)
 from app.core.database import get_db
+from app.core.metrics import span
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Pinning min/max to the configured cost makes any other cost "needs update",
+# so changing BCRYPT_ROUNDS rehashes users transparently on their next login.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 bearer_scheme = HTTPBearer()
 
+# sha256(token) → verified user document; never outlives the token itself.
+_principals = TTLCache(PRINCIPAL_CACHE_MAX_ENTRIES, PRINCIPAL_CACHE_TTL)
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
 
+# ── Password hashing (bounded executor, off the event loop) ───────────────────
+_hash_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_slots = asyncio.Semaphore(PASSWORD_HASH_MAX_PENDING)
 
-def verify_password(plain: str, hashed: str) -> bool:
-    return pwd_context.verify(plain, hashed)
+
+def _verify_and_update(plain: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    if not hashed:
+        return False, None
+    if pwd_context.identify(hashed) is None:
+        # Accounts registered before passwords were hashed: migrate on match.
+        if hmac.compare_digest(plain.encode("utf-8"), hashed.encode("utf-8")):
+            return True, pwd_context.hash(plain)
+        return False, None
+    return pwd_context.verify_and_update(plain, hashed)
+
+
+async def _run_hashing(fn, *args):
+    try:
+        await asyncio.wait_for(_hash_slots.acquire(), timeout=PASSWORD_HASH_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-in attempts right now, please retry",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_hash_pool, fn, *args)
+    finally:
+        _hash_slots.release()
+
+
+async def hash_password(password: str) -> str:
+    return await _run_hashing(pwd_context.hash, password)
+
+
+async def verify_password(plain: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """Return (valid, new_hash); new_hash is set when the stored hash should be replaced."""
+    return await _run_hashing(_verify_and_update, plain, hashed)
 
 
 def create_access_token(user_id: str) -> str:
@@ -31,13 +92,24 @@ def create_access_token(user_id: str) -> str:
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
 ):
+    with span("auth"):
+        return await _resolve_user(credentials)
+
+
+async def _resolve_user(credentials: HTTPAuthorizationCredentials):
     exc = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Invalid or expired token",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    token = credentials.credentials
+    key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    cached = _principals.get(key)
+    if cached is not None:
+        return dict(cached)
+
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
         if not user_id:
             raise exc
@@ -50,4 +122,16 @@ async def get_current_user(
         raise exc
 
     user["id"] = str(user["_id"])
-    return user
+    remaining = payload.get("exp", 0) - time.time()
+    if remaining > 0:
+        _principals.set(key, user, ttl=min(PRINCIPAL_CACHE_TTL, remaining))
+    return dict(user)
+
+
+def invalidate_principal(user_id: str) -> None:
+    """Forget cached principals for a user (after their record changes)."""
+    _principals.pop_where(lambda _, user: user["id"] == user_id)
+
+
+def principal_cache_stats() -> dict:
+    return _principals.stats()
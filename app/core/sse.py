@@ -0,0 +1,7 @@
+"""Server-sent events framing shared by the streaming endpoints."""
+import json
+
+
+def sse(event: str, data) -> str:
+    """One SSE frame: `event` name plus `data` as JSON (non-JSON values via str)."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
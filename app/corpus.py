@@ -0,0 +1,20 @@
+"""Per-user corpus versions, shared by every API process through MongoDB.
+
+A user's version is the wall-clock time of the last change to their vectors
+or lexical index (ingest, clone, delete), raised with `$max` so it only moves
+forward. Answers are cached against it, and a process whose open vector
+store predates it reopens the store before searching.
+"""
+import time
+
+
+async def version(db, user_id: str) -> float:
+    doc = await db["corpus_versions"].find_one({"_id": user_id})
+    return doc["version"] if doc else 0.0
+
+
+async def bump(db, user_id: str) -> None:
+    """Record that the user's corpus just changed (call after the write has landed)."""
+    await db["corpus_versions"].update_one(
+        {"_id": user_id}, {"$max": {"version": time.time()}}, upsert=True
+    )
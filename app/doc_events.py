@@ -0,0 +1,58 @@
+"""In-process bus for document status changes.
+
+The ingestion workers and the documents router publish here; each open
+`/api/documents/events` stream holds one subscriber queue for its user.
+Everything runs on the event loop, so no locking is needed. A slow
+subscriber loses its oldest events rather than blocking the publisher —
+later events for the same document supersede earlier ones anyway.
+"""
+import asyncio
+
+from app.core.config import DOC_EVENTS_QUEUE
+
+_subscribers: dict = {}  # user_id → set of asyncio.Queue
+
+IN_FLIGHT = ("pending", "processing")
+
+
+def progress(doc: dict) -> int:
+    if doc["status"] == "ready":
+        return 100
+    return int(100 * doc.get("pages_done", 0) / doc["pages"]) if doc.get("pages") else 0
+
+
+def status_event(doc: dict, **extra) -> dict:
+    """The fields of a document record that change while it is ingested."""
+    event = {
+        "id": str(doc["_id"]),
+        "status": doc["status"],
+        "pages": doc.get("pages", 0),
+        "chunks": doc.get("chunks", 0),
+        "progress": progress(doc),
+    }
+    if doc.get("error"):
+        event["error"] = doc["error"]
+    event.update(extra)
+    return event
+
+
+def subscribe(user_id: str) -> asyncio.Queue:
+    queue = asyncio.Queue(maxsize=DOC_EVENTS_QUEUE)
+    _subscribers.setdefault(user_id, set()).add(queue)
+    return queue
+
+
+def unsubscribe(user_id: str, queue: asyncio.Queue) -> None:
+    queues = _subscribers.get(user_id)
+    if queues is None:
+        return
+    queues.discard(queue)
+    if not queues:
+        del _subscribers[user_id]
+
+
+def publish(user_id: str, event: dict) -> None:
+    for queue in _subscribers.get(user_id, ()):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(event)
@@ -1,16 +1,88 @@
-from langchain_community.document_loaders import PyPDFLoader
+import os
+
+from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+TXT_PAGE_BYTES = 4000  # TXT files have no pages; cut them into line-aligned blocks of about this size
 
-def process_pdf(file_path: str) -> list:
-    """Load a PDF and split into overlapping chunks."""
-    loader = PyPDFLoader(file_path)
-    documents = loader.load()
 
-    splitter = RecursiveCharacterTextSplitter(
+def _splitter() -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
         chunk_size=1000,
         chunk_overlap=200,
         separators=["\n\n", "\n", " ", ""],
+        add_start_index=True,  # lets the context packer collapse overlapping neighbours
     )
-    chunks = splitter.split_documents(documents)
-    return chunks
+
+
+def _iter_pdf_pages(file_path: str, start: int, stop: int):
+    from pypdf import PdfReader
+    reader = PdfReader(file_path)
+    # Only the requested pages are extracted; earlier ones are never touched.
+    for n in range(start, min(stop, len(reader.pages))):
+        yield reader.pages[n].extract_text() or ""
+
+
+def _txt_page_count(file_path: str) -> int:
+    return -(-os.path.getsize(file_path) // TXT_PAGE_BYTES)
+
+
+def _iter_txt_pages(file_path: str, start: int, stop: int):
+    """Page n is the whole lines starting in bytes [n*TXT_PAGE_BYTES, (n+1)*TXT_PAGE_BYTES).
+
+    Each page is found by seeking, so a batch never re-reads the file before it.
+    """
+    with open(file_path, "rb") as f:
+        for n in range(start, min(stop, _txt_page_count(file_path))):
+            if n:
+                f.seek(n * TXT_PAGE_BYTES - 1)
+                f.readline()  # finish the line that page n - 1 owns
+            else:
+                f.seek(0)
+            end, lines = (n + 1) * TXT_PAGE_BYTES, []
+            while f.tell() < end:
+                line = f.readline()
+                if not line:
+                    break
+                lines.append(line)
+            yield b"".join(lines).decode("utf-8", errors="replace")
+
+
+_PAGE_READERS = {
+    ".pdf": _iter_pdf_pages,
+    ".txt": _iter_txt_pages,
+}
+
+
+def _page_reader(file_path: str):
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext not in _PAGE_READERS:
+        raise ValueError(f"Unsupported file type: {ext}")
+    return _PAGE_READERS[ext]
+
+
+def count_pages(file_path: str) -> int:
+    _page_reader(file_path)  # rejects unsupported types
+    if file_path.lower().endswith(".pdf"):
+        from pypdf import PdfReader
+        return len(PdfReader(file_path).pages)
+    return _txt_page_count(file_path)
+
+
+def iter_pages(file_path: str, start: int = 0, stop: int = None):
+    """Yield one Document per page in [start, stop), reading only those pages."""
+    stop = float("inf") if stop is None else stop
+    for n, text in enumerate(_page_reader(file_path)(file_path, start, stop), start):
+        yield Document(page_content=text, metadata={"source": file_path, "page": n})
+
+
+def iter_chunks(file_path: str, start: int = 0, stop: int = None):
+    """Yield overlapping chunks page by page."""
+    splitter = _splitter()
+    for page in iter_pages(file_path, start, stop):
+        yield from splitter.split_documents([page])
+
+
+def load_chunks(file_path: str, start: int = 0, stop: int = None) -> list:
+    """Chunks for a page range as a list (picklable entry point for the parse pool)."""
+    return list(iter_chunks(file_path, start, stop))
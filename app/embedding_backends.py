@@ -0,0 +1,85 @@
+"""Embedding backends, selected with EMBED_BACKEND.
+
+All backends serve the same model (EMBED_MODEL) and return L2-normalised
+vectors, so stores built with one stay searchable with another; the int8
+variants trade a little accuracy for faster CPU inference and less memory.
+"""
+from abc import ABC, abstractmethod
+
+from app.core.config import EMBED_MODEL, EMBED_ONNX_FILE
+
+
+class EmbeddingBackend(ABC):
+    name = ""
+
+    def __init__(self, model_name: str = EMBED_MODEL):
+        self.model_name = model_name
+        self.model = None
+
+    @abstractmethod
+    def load(self) -> None:
+        """Load the model into `self.model` (no-op if already loaded)."""
+
+    @abstractmethod
+    def embed(self, texts: list) -> list:
+        """L2-normalised vectors for `texts`, one list per text."""
+
+
+class SentenceTransformersBackend(EmbeddingBackend):
+    """Full-precision sentence-transformers model on CPU."""
+    name = "sentence-transformers"
+
+    def _build(self):
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(self.model_name, device="cpu")
+
+    def load(self) -> None:
+        if self.model is None:
+            self.model = self._build()
+
+    def embed(self, texts: list) -> list:
+        vectors = self.model.encode(
+            texts, batch_size=max(len(texts), 1), normalize_embeddings=True, convert_to_numpy=True
+        )
+        return vectors.tolist()
+
+
+class TorchInt8Backend(SentenceTransformersBackend):
+    """Same model with its Linear layers dynamically quantized to int8."""
+    name = "torch-int8"
+
+    def _build(self):
+        import torch
+        model = super()._build()
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class OnnxInt8Backend(SentenceTransformersBackend):
+    """Pre-quantized ONNX export run by onnxruntime (needs `optimum[onnxruntime]`)."""
+    name = "onnx-int8"
+
+    def _build(self):
+        from sentence_transformers import SentenceTransformer
+        try:
+            return SentenceTransformer(
+                self.model_name,
+                device="cpu",
+                backend="onnx",
+                model_kwargs={"file_name": EMBED_ONNX_FILE},
+            )
+        except ImportError as e:
+            raise RuntimeError(
+                "EMBED_BACKEND=onnx-int8 needs sentence-transformers>=3.2 and optimum[onnxruntime]"
+            ) from e
+
+
+BACKENDS = {
+    cls.name: cls
+    for cls in (SentenceTransformersBackend, TorchInt8Backend, OnnxInt8Backend)
+}
+
+
+def create_backend(name: str) -> EmbeddingBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown EMBED_BACKEND '{name}' (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[name]()
@@ -0,0 +1,149 @@
+"""Shared embedding server for multi-worker deployments.
+
+    python -m app.embedding_server            # listens on EMBED_SERVER_SOCKET
+
+One process holds the model and batches requests from every API worker
+through the usual EmbeddingBatcher. Workers started with the same
+EMBED_SERVER_SOCKET use it automatically and fall back to an in-process
+model whenever it is unreachable.
+
+Wire format, both directions: a 4-byte big-endian length and a JSON header.
+Requests are {"texts": [...], "priority": 0|1}; a reply header is
+{"n": rows, "dim": cols} followed by n*dim little-endian float32s, or
+{"error": "..."}.
+"""
+import json
+import os
+import socket
+import socketserver
+import struct
+import sys
+import threading
+from array import array
+
+from app.core.config import EMBED_SERVER_SOCKET
+
+_LEN = struct.Struct(">I")
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        part = sock.recv(n - len(buf))
+        if not part:
+            raise ConnectionError("embedding server connection closed")
+        buf.extend(part)
+    return bytes(buf)
+
+
+def _send_json(sock: socket.socket, obj: dict, payload: bytes = b"") -> None:
+    header = json.dumps(obj).encode("utf-8")
+    sock.sendall(_LEN.pack(len(header)) + header + payload)
+
+
+def _recv_json(sock: socket.socket) -> dict:
+    (size,) = _LEN.unpack(_recv_exact(sock, _LEN.size))
+    return json.loads(_recv_exact(sock, size))
+
+
+def _pack_vectors(vectors: list) -> tuple:
+    dim = len(vectors[0]) if vectors else 0
+    flat = array("f", (x for v in vectors for x in v))
+    if sys.byteorder != "little":
+        flat.byteswap()
+    return {"n": len(vectors), "dim": dim}, flat.tobytes()
+
+
+def _unpack_vectors(header: dict, payload: bytes) -> list:
+    flat = array("f")
+    flat.frombytes(payload)
+    if sys.byteorder != "little":
+        flat.byteswap()
+    dim = header["dim"]
+    return [flat[i * dim:(i + 1) * dim].tolist() for i in range(header["n"])]
+
+
+# ── Client ────────────────────────────────────────────────────────────────────
+class RemoteEmbedder:
+    """Talks to the embedding server; one persistent connection per thread."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.path)
+            except OSError:
+                sock.close()
+                raise
+            self._local.sock = sock
+        return sock
+
+    def _drop(self) -> None:
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def embed(self, texts: list, priority: int) -> list:
+        try:
+            sock = self._conn()
+            _send_json(sock, {"texts": texts, "priority": priority})
+            header = _recv_json(sock)
+            if "error" in header:
+                raise RuntimeError(f"embedding server: {header['error']}")
+            payload = _recv_exact(sock, header["n"] * header["dim"] * 4)
+        except OSError:
+            self._drop()
+            raise
+        return _unpack_vectors(header, payload)
+
+
+# ── Server ────────────────────────────────────────────────────────────────────
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self) -> None:
+        batcher = self.server.batcher
+        while True:
+            try:
+                req = _recv_json(self.request)
+            except (ConnectionError, OSError):
+                return
+            try:
+                vectors = batcher.embed(req["texts"], req.get("priority", 1))
+                header, payload = _pack_vectors(vectors)
+                _send_json(self.request, header, payload)
+            except Exception as e:
+                _send_json(self.request, {"error": str(e)})
+
+
+class _Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def serve(path: str = EMBED_SERVER_SOCKET) -> None:
+    from app import embedding_service
+
+    if not path:
+        raise SystemExit("Set EMBED_SERVER_SOCKET to the socket path to listen on")
+    embedding_service.warm_up()
+    if not embedding_service.is_ready():
+        raise SystemExit(f"Embedding model failed to load: {embedding_service.load_error()}")
+    if os.path.exists(path):
+        os.remove(path)
+
+    with _Server(path, _Handler) as server:
+        server.batcher = embedding_service.local_batcher()
+        os.chmod(path, 0o660)
+        print(f"✅ Embedding server listening on {path}")
+        try:
+            server.serve_forever()
+        finally:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    serve()
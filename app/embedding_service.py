@@ -0,0 +1,215 @@
+"""Shared embedding service.
+
+Every caller — query embedding inside a Chroma search, bulk embedding during
+ingest — goes through one background thread that groups pending texts into
+batches of up to EMBED_MAX_BATCH, waiting at most EMBED_MAX_WAIT_MS for a
+batch to fill. Query requests are always taken before bulk ones.
+"""
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+
+from langchain_core.embeddings import Embeddings
+
+from app.core.config import (
+    EMBED_MAX_BATCH,
+    EMBED_MAX_WAIT_MS,
+    EMBED_BACKEND,
+    EMBED_SERVER_SOCKET,
+    EMBED_SERVER_RETRY_SECONDS,
+)
+from app.core.metrics import EMBED_BATCH_SIZE, EMBED_QUEUE_SECONDS
+from app.embedding_backends import create_backend
+
+PRIORITY_QUERY = 0
+PRIORITY_BULK = 1
+
+
+class _Request:
+    __slots__ = ("texts", "future", "enqueued")
+
+    def __init__(self, texts: list):
+        self.texts = texts
+        self.future: Future = Future()
+        self.enqueued = time.monotonic()
+
+
+class EmbeddingBatcher:
+    def __init__(self, embed_fn, max_batch: int = EMBED_MAX_BATCH, max_wait_ms: float = EMBED_MAX_WAIT_MS):
+        self._embed_fn = embed_fn
+        self._max_batch = max_batch
+        self._max_wait = max_wait_ms / 1000
+        self._heap: list = []
+        self._pending = 0
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: threading.Thread = None
+
+    def embed(self, texts: list, priority: int = PRIORITY_BULK) -> list:
+        """Embed texts, blocking until their batch(es) have run."""
+        if not texts:
+            return []
+        requests = [
+            _Request(texts[i:i + self._max_batch])
+            for i in range(0, len(texts), self._max_batch)
+        ]
+        with self._cond:
+            self._ensure_thread()
+            for req in requests:
+                heapq.heappush(self._heap, (priority, next(self._seq), req))
+                self._pending += len(req.texts)
+            self._cond.notify()
+        vectors: list = []
+        for req in requests:
+            vectors.extend(req.future.result())
+        return vectors
+
+    # ── Worker ────────────────────────────────────────────────────────────────
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+            self._thread.start()
+
+    def _next_batch(self) -> list:
+        with self._cond:
+            while not self._heap:
+                self._cond.wait()
+            deadline = min(req.enqueued for _, _, req in self._heap) + self._max_wait
+            while self._pending < self._max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch, size = [], 0
+            while self._heap and size + len(self._heap[0][2].texts) <= self._max_batch:
+                req = heapq.heappop(self._heap)[2]
+                batch.append(req)
+                size += len(req.texts)
+            self._pending -= size
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            started = time.monotonic()
+            texts = [t for req in batch for t in req.texts]
+            try:
+                vectors = self._embed_fn(texts)
+            except Exception as e:
+                for req in batch:
+                    req.future.set_exception(e)
+                continue
+
+            offset = 0
+            for req in batch:
+                req.future.set_result(vectors[offset:offset + len(req.texts)])
+                offset += len(req.texts)
+
+            EMBED_BATCH_SIZE.observe(len(texts))
+            for req in batch:
+                EMBED_QUEUE_SECONDS.observe(started - req.enqueued)
+
+
+class BatchedEmbeddings(Embeddings):
+    """LangChain adapter: queries go in at high priority, documents as bulk."""
+
+    def __init__(self, batcher: EmbeddingBatcher):
+        self.batcher = batcher
+
+    def embed_documents(self, texts: list) -> list:
+        return self.batcher.embed(list(texts), PRIORITY_BULK)
+
+    def embed_query(self, text: str) -> list:
+        return self.batcher.embed([text], PRIORITY_QUERY)[0]
+
+
+# ── Singleton embedding backend (warmed up at startup) ────────────────────────
+_backend = None
+_batcher: EmbeddingBatcher = None
+_embeddings: BatchedEmbeddings = None
+_lock = threading.Lock()
+_backend_lock = threading.Lock()  # held for the whole (slow) model load
+_ready = threading.Event()
+_load_error: str = None
+
+
+def _get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_backend(EMBED_BACKEND)
+        if _backend.model is None:
+            print(f"Loading embedding model {_backend.model_name} ({_backend.name})…")
+            _backend.load()
+            print("✅ Embedding model ready")
+    return _backend
+
+
+def _embed(texts: list) -> list:
+    return _get_backend().embed(texts)
+
+
+def local_batcher() -> EmbeddingBatcher:
+    global _batcher
+    with _lock:
+        if _batcher is None:
+            _batcher = EmbeddingBatcher(_embed)
+    return _batcher
+
+
+class _SharedOrLocal:
+    """Prefer the shared embedding server; fall back to the in-process model."""
+
+    def __init__(self, path: str):
+        from app.embedding_server import RemoteEmbedder
+        self.remote = RemoteEmbedder(path)
+        self._retry_at = 0.0
+
+    def embed(self, texts: list, priority: int = PRIORITY_BULK) -> list:
+        if time.monotonic() >= self._retry_at:
+            try:
+                return self.remote.embed(texts, priority)
+            except OSError as e:
+                print(f"Embedding server unavailable ({e}); using in-process model")
+                self._retry_at = time.monotonic() + EMBED_SERVER_RETRY_SECONDS
+        return local_batcher().embed(texts, priority)
+
+
+def warm_up(local_only: bool = False) -> None:
+    """Load the model and run one batch so the first request doesn't pay for it.
+
+    With a shared embedding server configured, only a round-trip to it is
+    needed and the local model is loaded just if the server is unreachable.
+    """
+    global _load_error
+    try:
+        if EMBED_SERVER_SOCKET and not local_only:
+            get_embeddings().embed_query("warm-up")
+        else:
+            _embed(["warm-up"])
+        _ready.set()
+    except Exception as e:
+        _load_error = str(e)
+        print(f"Embedding warm-up failed: {e}")
+
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+
+def load_error() -> str:
+    return _load_error
+
+
+def get_embeddings() -> BatchedEmbeddings:
+    global _embeddings
+    if _embeddings is None:
+        source = _SharedOrLocal(EMBED_SERVER_SOCKET) if EMBED_SERVER_SOCKET else local_batcher()
+        with _lock:
+            if _embeddings is None:
+                _embeddings = BatchedEmbeddings(source)
+    return _embeddings
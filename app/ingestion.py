@@ -0,0 +1,303 @@
+"""Durable ingestion queue.
+
+Jobs live on the `documents` records themselves: a `pending` document with
+`next_attempt_at <= now` is claimable, and a claimed job holds a lease
+(`lease_until`) that its worker keeps renewing. A job whose lease has
+lapsed — its worker died or the process restarted — is claimable again.
+
+Parsing runs in a process pool, a page batch at a time; embedding and the Chroma write run in a
+small dedicated thread pool so the per-user store registry stays the single
+writer for each store and ingest work never competes with the search pool.
+
+Only the API process holding the vector-store writer lock
+(`rag_engine.claim_writer`) runs workers; the others keep trying to take it
+over. Vectors of deleted documents are removed by the writer too, from the
+`vector_deletions` queue. Every write bumps the user's corpus version.
+"""
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from functools import partial
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from app.core.config import (
+    INGEST_WORKERS,
+    INGEST_PARSE_PROCESSES,
+    INGEST_MAX_ATTEMPTS,
+    INGEST_RETRY_BASE,
+    INGEST_LEASE_SECONDS,
+    INGEST_POLL_SECONDS,
+    INGEST_PAGE_BATCH,
+)
+from app import corpus, doc_events
+from app.core import doc_cache
+from app.core.database import get_db
+from app.core.metrics import span
+from app.document_loader import count_pages, load_chunks
+from app.rag_engine import claim_writer, ingest, delete_doc, clone_doc, finalize_doc
+
+_parse_pool: ProcessPoolExecutor = None
+_embed_pool: ThreadPoolExecutor = None
+_wake: asyncio.Event = None
+_tasks: list = []
+
+
+def notify() -> None:
+    """Wake idle workers after a new job has been queued."""
+    if _wake is not None:
+        _wake.set()
+
+
+async def recover_orphans(db) -> None:
+    """Requeue jobs left behind by a previous run."""
+    now = datetime.utcnow()
+    # Lapsed leases: the worker holding them is gone.
+    lapsed = await db["documents"].update_many(
+        {"status": "processing", "lease_until": {"$lt": now}},
+        {"$set": {"status": "pending", "next_attempt_at": now}},
+    )
+    # Records queued before the job fields existed.
+    legacy = await db["documents"].update_many(
+        {"status": {"$in": ["pending", "processing"]}, "next_attempt_at": {"$exists": False}},
+        {"$set": {"status": "pending", "next_attempt_at": now, "attempts": 0}},
+    )
+    if lapsed.modified_count or legacy.modified_count:
+        print(f"Requeued {lapsed.modified_count + legacy.modified_count} orphaned ingestion job(s)")
+
+
+async def queue_delete(db, user_id: str, doc_id: str) -> None:
+    """Have the writer process remove a deleted document's vectors."""
+    await db["vector_deletions"].insert_one({"user_id": user_id, "doc_id": doc_id})
+    notify()
+
+
+async def _claim_deletion(db):
+    now = datetime.utcnow()
+    return await db["vector_deletions"].find_one_and_update(
+        {"$or": [{"lease_until": {"$exists": False}}, {"lease_until": {"$lt": now}}]},
+        {"$set": {"lease_until": now + timedelta(seconds=INGEST_LEASE_SECONDS)}},
+    )
+
+
+async def _write(db, user_id: str, fn, *args):
+    """Run a vector/lexical write in the embed pool, then publish the user's new corpus version."""
+    result = await asyncio.get_running_loop().run_in_executor(_embed_pool, fn, *args)
+    await corpus.bump(db, user_id)
+    return result
+
+
+async def _claim(db):
+    now = datetime.utcnow()
+    return await db["documents"].find_one_and_update(
+        {"$or": [
+            {"status": "pending", "next_attempt_at": {"$lte": now}},
+            {"status": "processing", "lease_until": {"$lt": now}},
+        ]},
+        {
+            "$set": {"status": "processing", "lease_until": now + timedelta(seconds=INGEST_LEASE_SECONDS)},
+            "$inc": {"attempts": 1},
+        },
+        sort=[("next_attempt_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def _heartbeat(db, doc_id: ObjectId) -> None:
+    while True:
+        await asyncio.sleep(INGEST_LEASE_SECONDS / 3)
+        lease = datetime.utcnow() + timedelta(seconds=INGEST_LEASE_SECONDS)
+        await db["documents"].update_one(
+            {"_id": doc_id, "status": "processing"}, {"$set": {"lease_until": lease}}
+        )
+
+
+async def _reuse_identical(db, job: dict):
+    """If the user already has a ready copy of this exact file, clone its vectors."""
+    if not job.get("sha256"):
+        return None
+    src = await db["documents"].find_one({
+        "user_id": job["user_id"],
+        "sha256": job["sha256"],
+        "status": "ready",
+        "_id": {"$ne": job["_id"]},
+    })
+    if src is None:
+        return None
+    copied = await _write(db, job["user_id"], clone_doc, job["user_id"], str(src["_id"]), str(job["_id"]))
+    if not copied:
+        return None
+    return {"chunks": copied, "pages": src.get("pages", 0), "duplicate_of": str(src["_id"])}
+
+
+def _new_parse_pool() -> ProcessPoolExecutor:
+    # spawn, not fork: the API process already runs Mongo/Chroma threads.
+    return ProcessPoolExecutor(
+        max_workers=INGEST_PARSE_PROCESSES, mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+async def _parse(fn, *args):
+    """Run `fn` in the parse pool, replacing the pool if one of its processes died."""
+    global _parse_pool
+    pool = _parse_pool
+    try:
+        return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+    except BrokenProcessPool:
+        if _parse_pool is pool:  # first job to notice replaces it
+            print("Parse process died (out of memory?); restarting the parse pool")
+            pool.shutdown(wait=False, cancel_futures=True)
+            _parse_pool = _new_parse_pool()
+        raise  # this attempt fails and is retried with backoff
+
+
+async def _ingest_pages(db, job: dict) -> dict:
+    """Parse and embed the file INGEST_PAGE_BATCH pages at a time, recording progress."""
+    doc_id, user_id, path = str(job["_id"]), job["user_id"], job["file_path"]
+
+    with span("ingest_count_pages"):
+        total = await _parse(count_pages, path)
+    state = {"_id": job["_id"], "status": "processing", "pages": total, "pages_done": 0, "chunks": 0}
+    await db["documents"].update_one(
+        {"_id": job["_id"]}, {"$set": {"pages": total, "pages_done": 0, "chunks": 0}}
+    )
+    doc_events.publish(user_id, doc_events.status_event(state))
+    chunks_done = 0
+    for start in range(0, total, INGEST_PAGE_BATCH):
+        stop = min(start + INGEST_PAGE_BATCH, total)
+        with span("ingest_parse"):
+            chunks = await _parse(load_chunks, path, start, stop)
+        with span("ingest_embed"):
+            await _write(db, user_id, partial(ingest, chunks, user_id, doc_id, offset=chunks_done, flush=False))
+        chunks_done += len(chunks)
+        await db["documents"].update_one(
+            {"_id": job["_id"]}, {"$set": {"pages_done": stop, "chunks": chunks_done}}
+        )
+        state.update(pages_done=stop, chunks=chunks_done)
+        doc_events.publish(user_id, doc_events.status_event(state))
+    await _write(db, user_id, finalize_doc, user_id, doc_id)
+    return {"chunks": chunks_done, "pages": total}
+
+
+async def _process(db, job: dict) -> None:
+    """Parse → embed → update status, retrying with backoff on failure."""
+    doc_id = str(job["_id"])
+    user_id = job["user_id"]
+    attempts = job.get("attempts", 1)
+    heartbeat = asyncio.create_task(_heartbeat(db, job["_id"]))
+    doc_cache.invalidate(user_id, doc_id)  # now "processing"
+    doc_events.publish(user_id, doc_events.status_event(job))
+    try:
+        if attempts > 1:
+            # Drop whatever a previous, interrupted attempt managed to write.
+            await _write(db, user_id, delete_doc, user_id, doc_id)
+        stats = await _reuse_identical(db, job)
+        if stats is None:
+            stats = await _ingest_pages(db, job)
+
+        result = await db["documents"].update_one(
+            {"_id": job["_id"]},
+            {
+                "$set": {"status": "ready", **stats},
+                "$unset": {"lease_until": "", "next_attempt_at": "", "error": ""},
+            },
+        )
+        if result.matched_count == 0:
+            # Deleted while we were embedding — don't leave orphan vectors behind.
+            await _write(db, user_id, delete_doc, user_id, doc_id)
+        else:
+            doc_events.publish(user_id, doc_events.status_event({**job, **stats, "status": "ready", "error": None}))
+    except Exception as e:
+        print(f"Document processing error ({doc_id}, attempt {attempts}): {e}")
+        if attempts >= INGEST_MAX_ATTEMPTS:
+            update = {"$set": {"status": "error", "error": str(e)}, "$unset": {"lease_until": ""}}
+        else:
+            retry_at = datetime.utcnow() + timedelta(seconds=INGEST_RETRY_BASE * 2 ** (attempts - 1))
+            update = {
+                "$set": {"status": "pending", "next_attempt_at": retry_at, "error": str(e)},
+                "$unset": {"lease_until": ""},
+            }
+        result = await db["documents"].update_one({"_id": job["_id"]}, update)
+        if result.matched_count:
+            doc_events.publish(user_id, doc_events.status_event({**job, **update["$set"]}))
+        else:
+            # Deleted mid-ingest (its file is gone, hence the failure): drop what we wrote since.
+            await _write(db, user_id, delete_doc, user_id, doc_id)
+    finally:
+        doc_cache.invalidate(user_id, doc_id)
+        heartbeat.cancel()
+
+
+async def _worker() -> None:
+    db = get_db()
+    while True:
+        try:
+            deletion = await _claim_deletion(db)
+            job = None if deletion else await _claim(db)
+        except Exception as e:
+            print(f"Ingestion queue error: {e}")
+            deletion = job = None
+
+        if deletion is not None:
+            try:
+                await _write(db, deletion["user_id"], delete_doc, deletion["user_id"], deletion["doc_id"])
+                await db["vector_deletions"].delete_one({"_id": deletion["_id"]})
+            except Exception as e:
+                print(f"Vector deletion error ({deletion['doc_id']}): {e}")
+            continue
+
+        if job is not None:
+            try:
+                await _process(db, job)
+            except Exception as e:
+                # e.g. Mongo down while recording a failure: the lease lapses and the job is reclaimed.
+                print(f"Ingestion worker error ({job['_id']}): {e}")
+            continue
+
+        try:
+            await asyncio.wait_for(_wake.wait(), timeout=INGEST_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        _wake.clear()
+
+
+async def _start_writer(db) -> None:
+    global _parse_pool, _embed_pool
+    await recover_orphans(db)
+    _parse_pool = _new_parse_pool()
+    _embed_pool = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+    _tasks.extend(asyncio.create_task(_worker()) for _ in range(INGEST_WORKERS))
+    print(f"✅ Ingestion workers started ({INGEST_WORKERS} jobs, {INGEST_PARSE_PROCESSES} parse processes)")
+
+
+async def _standby(db) -> None:
+    """Take over ingestion when the writer process goes away."""
+    while not claim_writer():
+        await asyncio.sleep(INGEST_POLL_SECONDS)
+    await _start_writer(db)
+
+
+async def start_workers() -> None:
+    global _wake
+    db = get_db()
+    await db["documents"].create_index([("status", 1), ("next_attempt_at", 1)])
+    _wake = asyncio.Event()
+    if claim_writer():
+        await _start_writer(db)
+    else:
+        print("Another API process writes the vector store; this one serves queries")
+        _tasks.append(asyncio.create_task(_standby(db)))
+
+
+async def stop_workers() -> None:
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
+    if _parse_pool is not None:
+        _parse_pool.shutdown(wait=False, cancel_futures=True)
+    if _embed_pool is not None:
+        _embed_pool.shutdown(wait=False, cancel_futures=True)
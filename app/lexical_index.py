@@ -0,0 +1,168 @@
+"""Per-user BM25 inverted index kept alongside each user's Chroma collection.
+
+Dense MiniLM vectors blur exact tokens such as part numbers and policy codes;
+this index catches them. It is an SQLite database per user under LEXICAL_DIR
+(postings and chunk lengths), so every API process reads and updates the same
+index row by row; open indexes are kept in a small LRU.
+"""
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+from app.core.config import LEXICAL_DIR, CHROMA_MAX_OPEN_STORES
+
+# Keeps "ab-1234", "4.2.1" and "hr_policy" as single tokens.
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> list:
+    return TOKEN_RE.findall(text.lower())
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (chunk_id TEXT PRIMARY KEY, doc_id TEXT NOT NULL, length INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS chunks_doc ON chunks (doc_id);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL, chunk_id TEXT NOT NULL, tf INTEGER NOT NULL, PRIMARY KEY (term, chunk_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_chunk ON postings (chunk_id);
+"""
+
+
+class LexicalIndex:
+    def __init__(self, path: str):
+        self.path = path
+        self.dirty = False  # uncommitted changes
+        self.in_use = 0  # borrowers; guarded by the registry lock
+        self.lock = threading.RLock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # One connection per index, serialised by `lock`; WAL lets other processes read meanwhile.
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(_SCHEMA)
+
+    # ── Persistence ───────────────────────────────────────────────────────────
+
+    @classmethod
+    def load(cls, path: str) -> "LexicalIndex":
+        return cls(path)
+
+    def save(self) -> None:
+        """Commit pending changes; until then other processes don't see them."""
+        with self.lock:
+            if self.dirty:
+                self.db.commit()
+                self.dirty = False
+
+    def close(self) -> None:
+        with self.lock:
+            self.save()
+            self.db.close()
+
+    # ── Maintenance ───────────────────────────────────────────────────────────
+
+    def add(self, chunk_id: str, doc_id: str, text: str) -> None:
+        terms = tokenize(text)
+        with self.lock:
+            self.db.execute("DELETE FROM postings WHERE chunk_id = ?", (chunk_id,))
+            self.db.execute("INSERT OR REPLACE INTO chunks VALUES (?, ?, ?)", (chunk_id, doc_id, len(terms)))
+            self.db.executemany(
+                "INSERT INTO postings VALUES (?, ?, ?)",
+                [(term, chunk_id, tf) for term, tf in Counter(terms).items()],
+            )
+            self.dirty = True
+
+    def remove_doc(self, doc_id: str) -> None:
+        with self.lock:
+            self.db.execute(
+                "DELETE FROM postings WHERE chunk_id IN (SELECT chunk_id FROM chunks WHERE doc_id = ?)", (doc_id,)
+            )
+            self.db.execute("DELETE FROM chunks WHERE doc_id = ?", (doc_id,))
+            self.dirty = True
+
+    # ── Query ─────────────────────────────────────────────────────────────────
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def doc_ids(self) -> set:
+        with self.lock:
+            return {row[0] for row in self.db.execute("SELECT DISTINCT doc_id FROM chunks")}
+
+    def search(self, query: str, k: int, doc_ids: list = None) -> list:
+        """Return [(chunk_id, bm25_score)] best first."""
+        with self.lock:
+            n, total_len = self.db.execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM chunks").fetchone()
+            if not n:
+                return []
+            allowed = set(doc_ids) if doc_ids else None
+            avg_len = total_len / n
+            scores: dict = {}
+            for term in set(tokenize(query)):
+                plist = self.db.execute(
+                    "SELECT p.chunk_id, p.tf, c.doc_id, c.length FROM postings p"
+                    " JOIN chunks c ON c.chunk_id = p.chunk_id WHERE p.term = ?",
+                    (term,),
+                ).fetchall()
+                if not plist:
+                    continue
+                idf = math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+                for cid, tf, did, length in plist:
+                    if allowed is not None and did not in allowed:
+                        continue
+                    norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_len)
+                    scores[cid] = scores.get(cid, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+        return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:k]
+
+
+# ── Loaded-index registry ─────────────────────────────────────────────────────
+_indexes: "OrderedDict[str, LexicalIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def index_path(user_id: str) -> str:
+    return os.path.join(LEXICAL_DIR, f"user_{user_id}.sqlite3")
+
+
+@contextmanager
+def borrow(user_id: str):
+    """Use a user's index, loading it on first use.
+
+    Only indexes nobody is using and with nothing left to save are evicted,
+    so an update can't land on a copy that has already been dropped.
+    """
+    with _indexes_lock:
+        index = _indexes.get(user_id)
+        if index is None:
+            index = _indexes[user_id] = LexicalIndex.load(index_path(user_id))
+        _indexes.move_to_end(user_id)
+        index.in_use += 1
+    try:
+        yield index
+    finally:
+        with _indexes_lock:
+            index.in_use -= 1
+            for key in list(_indexes):
+                if len(_indexes) <= CHROMA_MAX_OPEN_STORES:
+                    break
+                old = _indexes[key]
+                if not old.in_use and not old.dirty:
+                    del _indexes[key]
+                    old.close()
+
+
+def close_all() -> None:
+    """Commit and close every open index (application shutdown)."""
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+        _indexes.clear()
+    for index in indexes:
+        index.close()
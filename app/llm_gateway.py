@@ -0,0 +1,286 @@
+"""Single entry point for LLM calls: admission control and request coalescing.
+
+At most LLM_MAX_CONCURRENCY provider calls run at once. Callers beyond that
+wait in per-user queues that are served round-robin, so one user firing
+many questions can't starve the rest. A full queue, a wait longer than
+LLM_QUEUE_TIMEOUT, or a provider rate limit surfaces as 429 with a
+Retry-After header.
+
+Identical prompts — same packed context and question — that arrive while
+one is already being generated join that generation instead of starting
+another; every waiter receives the same tokens.
+"""
+import asyncio
+import hashlib
+import math
+import os
+import time
+from collections import OrderedDict, deque
+
+from fastapi import HTTPException, status
+
+from app.core.config import (
+    GROQ_API_KEY,
+    LLM_TIMEOUT,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_QUEUED,
+    LLM_MAX_QUEUED_PER_USER,
+    LLM_QUEUE_TIMEOUT,
+    LLM_RETRY_AFTER,
+)
+from app.core.metrics import LLM_COALESCED, LLM_IN_FLIGHT, LLM_QUEUED, LLM_REJECTED
+
+# ── Client ────────────────────────────────────────────────────────────────────
+_llm = None
+
+
+def get_llm():
+    global _llm
+    if _llm is None:
+        if not GROQ_API_KEY or GROQ_API_KEY == "your_groq_api_key_here":
+            raise HTTPException(
+                status_code=503,
+                detail="GROQ_API_KEY not set in .env file. Get a free key at https://console.groq.com",
+            )
+        os.environ["GROQ_API_KEY"] = GROQ_API_KEY
+        from langchain_groq import ChatGroq
+        _llm = ChatGroq(model="llama-3.3-70b-versatile", temperature=0.1)
+    return _llm
+
+
+def _too_busy(reason: str, retry_after: int) -> HTTPException:
+    LLM_REJECTED.labels(reason).inc()
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="The assistant is busy right now, please retry shortly",
+        headers={"Retry-After": str(retry_after)},
+    )
+
+
+# ── Fair admission (round-robin over users) ───────────────────────────────────
+class _Gate:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.running = 0
+        self.waiting: "OrderedDict[str, deque]" = OrderedDict()  # user_id → queued futures
+        self.queued = 0
+        self.avg_seconds = 5.0  # EWMA of call duration, for Retry-After estimates
+        self.cooldown_until = 0.0  # set when the provider itself rate-limits us
+
+    def retry_after(self) -> int:
+        backlog = self.queued / max(self.limit, 1) + 1
+        return max(1, math.ceil(self.avg_seconds * backlog))
+
+    async def acquire(self, user_id: str) -> None:
+        now = time.monotonic()
+        if now < self.cooldown_until:
+            raise _too_busy("provider", math.ceil(self.cooldown_until - now))
+        if self.running < self.limit and not self.waiting:
+            self.running += 1
+            return
+        mine = self.waiting.get(user_id)
+        if mine is not None and len(mine) >= LLM_MAX_QUEUED_PER_USER:
+            raise _too_busy("user_queue", self.retry_after())
+        if self.queued >= LLM_MAX_QUEUED:
+            raise _too_busy("queue", self.retry_after())
+
+        slot = asyncio.get_running_loop().create_future()
+        self.waiting.setdefault(user_id, deque()).append(slot)
+        self.queued += 1
+        LLM_QUEUED.inc()
+        try:
+            await asyncio.wait_for(slot, timeout=LLM_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise _too_busy("timeout", self.retry_after())
+        except BaseException:
+            if slot.done() and not slot.cancelled():
+                self.release()  # handed a slot just as we gave up
+            raise
+        finally:
+            if not slot.done() or slot.cancelled():
+                self._forget(user_id, slot)
+
+    def _forget(self, user_id: str, slot) -> None:
+        queue = self.waiting.get(user_id)
+        if queue is not None and slot in queue:
+            queue.remove(slot)
+            self.queued -= 1
+            LLM_QUEUED.dec()
+            if not queue:
+                del self.waiting[user_id]
+
+    def release(self) -> None:
+        """Hand the slot to the next user in rotation, or free it."""
+        while self.waiting:
+            user_id, queue = next(iter(self.waiting.items()))
+            slot = queue.popleft()
+            self.queued -= 1
+            LLM_QUEUED.dec()
+            if queue:
+                self.waiting.move_to_end(user_id)
+            else:
+                del self.waiting[user_id]
+            if not slot.done():
+                slot.set_result(None)
+                return
+        self.running -= 1
+
+    def observe(self, seconds: float) -> None:
+        self.avg_seconds = 0.8 * self.avg_seconds + 0.2 * seconds
+
+
+_gate = _Gate(LLM_MAX_CONCURRENCY)
+
+
+# ── Single-flight generations ─────────────────────────────────────────────────
+class _Flight:
+    """One provider call whose tokens are replayed to every caller that joined it."""
+
+    def __init__(self):
+        self.parts: list = []
+        self.done = False
+        self.error = None
+        self._changed = asyncio.Event()
+
+    def _notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def push(self, text: str) -> None:
+        self.parts.append(text)
+        self._notify()
+
+    def finish(self, error: BaseException = None) -> None:
+        self.done = True
+        self.error = error
+        self._notify()
+
+    async def started(self) -> None:
+        """Wait for the first token; errors before it are raised as HTTP errors."""
+        while not self.parts and not self.done:
+            await self._changed.wait()
+        if self.error is not None and not self.parts:
+            raise _http_error(self.error)
+
+    async def replay(self):
+        i = 0
+        while True:
+            if i < len(self.parts):
+                yield self.parts[i]
+                i += 1
+            elif self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            else:
+                await self._changed.wait()
+
+
+_flights: dict = {}  # prompt key → _Flight
+_tasks: set = set()
+
+
+def _key(messages: list) -> str:
+    digest = hashlib.sha256()
+    for m in messages:
+        digest.update(m.type.encode())
+        digest.update(b"\0")
+        digest.update(m.content.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _provider_retry_after(e: Exception):
+    """Seconds to back off if `e` is the provider's 429, else None."""
+    if getattr(e, "status_code", None) != 429:
+        return None
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    try:
+        return max(1, math.ceil(float(headers.get("retry-after", ""))))
+    except ValueError:
+        return LLM_RETRY_AFTER
+
+
+def _http_error(e: BaseException) -> BaseException:
+    if isinstance(e, HTTPException):
+        return e
+    if isinstance(e, asyncio.TimeoutError):
+        return HTTPException(status_code=504, detail="The language model took too long to respond")
+    return e
+
+
+async def _fly(key: str, flight: _Flight, llm, user_id: str, messages: list) -> None:
+    try:
+        await _gate.acquire(user_id)
+    except asyncio.CancelledError:
+        _flights.pop(key, None)
+        flight.finish(HTTPException(status_code=503, detail="Server is shutting down"))
+        raise
+    except Exception as e:
+        _flights.pop(key, None)
+        flight.finish(e)
+        return
+
+    LLM_IN_FLIGHT.inc()
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    deadline = started + LLM_TIMEOUT
+    try:
+        stream = llm.astream(messages).__aiter__()
+        while True:
+            try:
+                chunk = await asyncio.wait_for(stream.__anext__(), timeout=max(deadline - loop.time(), 0))
+            except StopAsyncIteration:
+                break
+            if chunk.content:
+                flight.push(chunk.content)
+        flight.finish()
+    except asyncio.CancelledError:
+        flight.finish(HTTPException(status_code=503, detail="Server is shutting down"))
+        raise
+    except Exception as e:
+        retry_after = _provider_retry_after(e)
+        if retry_after is not None:
+            print(f"LLM provider rate limit, backing off {retry_after}s")
+            _gate.cooldown_until = time.monotonic() + retry_after
+            e = _too_busy("provider", retry_after)
+        flight.finish(e)
+    finally:
+        _flights.pop(key, None)
+        _gate.observe(loop.time() - started)
+        LLM_IN_FLIGHT.dec()
+        _gate.release()
+
+
+async def open_stream(user_id: str, messages: list) -> _Flight:
+    """Admit (or join) a generation and wait for its first token.
+
+    Raises HTTPException 429/503/504 before anything has been generated;
+    later failures are raised from `replay()`.
+    """
+    key = _key(messages)
+    flight = _flights.get(key)
+    if flight is None:
+        llm = get_llm()
+        flight = _flights[key] = _Flight()
+        task = asyncio.create_task(_fly(key, flight, llm, user_id, messages))
+        _tasks.add(task)
+        task.add_done_callback(_tasks.discard)
+    else:
+        LLM_COALESCED.inc()
+    await flight.started()
+    return flight
+
+
+async def generate(user_id: str, messages: list) -> str:
+    flight = await open_stream(user_id, messages)
+    try:
+        return "".join([part async for part in flight.replay()])
+    except BaseException as e:
+        raise _http_error(e)
+
+
+async def shutdown() -> None:
+    for task in list(_tasks):
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
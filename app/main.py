@@ -1,16 +1,40 @@
+import asyncio
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST
 
-from app.core.database import connect_db, close_db
-from app.routers import auth, documents, chat
+from app.core import doc_cache
+from app.core.database import connect_db, close_db, get_db
+from app.core.metrics import (
+    CONTEXT_TOKENS_SAVED, INGEST_QUEUE_DEPTH, MetricsMiddleware, render, set_cache_stats,
+)
+from app.core.security import principal_cache_stats
+from app import answer_cache, batch_qa, context_packer, embedding_service, llm_gateway
+from app.ingestion import start_workers, stop_workers
+from app.rag_engine import close_stores, shutdown_pool
+from app.routers import auth, documents, chat, batch
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Model loads in the background; /health reports not-ready until it's done.
+    warm_up = asyncio.create_task(asyncio.to_thread(embedding_service.warm_up))
+    # Until the tokenizer is in, context packing estimates 4 chars per token.
+    tokenizer = asyncio.create_task(asyncio.to_thread(context_packer.warm_up))
     await connect_db()
+    await start_workers()
+    await batch_qa.resume_jobs()
     yield
+    warm_up.cancel()
+    tokenizer.cancel()
+    await batch_qa.stop_jobs()
+    await llm_gateway.shutdown()
+    await stop_workers()
+    shutdown_pool()
+    close_stores()
     await close_db()
 
 
@@ -28,9 +52,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(auth.router)
 app.include_router(documents.router)
 app.include_router(chat.router)
+app.include_router(batch.router)
 
 
 @app.get("/")
@@ -40,4 +67,20 @@ def root():
 
 @app.get("/health")
 def health():
-    return {"status": "healthy"}
+    if embedding_service.is_ready():
+        return {"status": "healthy"}
+    if embedding_service.load_error():
+        return JSONResponse(status_code=503, content={"status": "unhealthy", "error": embedding_service.load_error()})
+    return JSONResponse(status_code=503, content={"status": "starting"})
+
+
+@app.get("/metrics")
+async def metrics():
+    db = get_db()
+    for status in ("pending", "processing"):
+        INGEST_QUEUE_DEPTH.labels(status).set(await db.documents.count_documents({"status": status}))
+    set_cache_stats("documents", doc_cache.stats())
+    set_cache_stats("principals", principal_cache_stats())
+    set_cache_stats("answers", answer_cache.stats())
+    CONTEXT_TOKENS_SAVED.set(context_packer.stats()["saved_tokens"])
+    return Response(render(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,105 @@
+"""Move per-user Chroma directories into the sharded layout.
+
+    python -m app.migrate_vector_layout              # copy, keep the old directories
+    python -m app.migrate_vector_layout --remove     # delete each one once verified
+    python -m app.migrate_vector_layout --dry-run
+
+Run it with the API stopped, then start the API with
+VECTOR_STORE_LAYOUT=sharded. Copies are upserts under the original chunk
+ids, so an interrupted run can simply be repeated. Lexical indexes are per
+user in both layouts and are left alone.
+"""
+import argparse
+import os
+import re
+import shutil
+
+import chromadb
+
+from app.core.config import CHROMA_DIR, VECTOR_SHARDS
+from app.rag_engine import close_client, store_location
+
+_USER_DIR = re.compile(r"^user_(.+)$")
+_PAGE = 1000
+
+
+def _user_dirs() -> list:
+    if not os.path.isdir(CHROMA_DIR):
+        return []
+    found = []
+    for name in sorted(os.listdir(CHROMA_DIR)):
+        m = _USER_DIR.match(name)
+        if m and os.path.isdir(os.path.join(CHROMA_DIR, name)):
+            found.append((m.group(1), os.path.join(CHROMA_DIR, name)))
+    return found
+
+
+def _copy_user(user_id: str, src_path: str, shards: dict) -> int:
+    src = chromadb.PersistentClient(path=src_path)
+    try:
+        return _copy_collection(user_id, src, shards)
+    finally:
+        close_client(src)
+
+
+def _copy_collection(user_id: str, src, shards: dict) -> int:
+    try:
+        col = src.get_collection(f"u_{user_id}")
+    except Exception:
+        return 0
+
+    _, dst_path, name = store_location(user_id, layout="sharded")
+    if dst_path not in shards:
+        os.makedirs(dst_path, exist_ok=True)
+        shards[dst_path] = chromadb.PersistentClient(path=dst_path)
+    dst = shards[dst_path].get_or_create_collection(name)
+
+    copied = 0
+    while True:
+        page = col.get(include=["embeddings", "metadatas", "documents"], limit=_PAGE, offset=copied)
+        if not page["ids"]:
+            break
+        dst.upsert(
+            ids=page["ids"],
+            embeddings=[[float(x) for x in vec] for vec in page["embeddings"]],
+            metadatas=[{**m, "user_id": user_id} for m in page["metadatas"]],
+            documents=page["documents"],
+        )
+        copied += len(page["ids"])
+
+    landed = len(dst.get(where={"user_id": user_id}, include=[])["ids"])
+    if landed < copied:
+        raise RuntimeError(f"user {user_id}: copied {copied} chunks but only {landed} are in {name}")
+    return copied
+
+
+def migrate(remove: bool = False, dry_run: bool = False) -> None:
+    users = _user_dirs()
+    print(f"{len(users)} per-user store(s) in {CHROMA_DIR} → {VECTOR_SHARDS} shard(s)")
+    shards: dict = {}
+    total = 0
+    for user_id, path in users:
+        if dry_run:
+            print(f"  {user_id} → {store_location(user_id, layout='sharded')[2]}")
+            continue
+        copied = _copy_user(user_id, path, shards)
+        total += copied
+        print(f"  {user_id}: {copied} chunks")
+        if remove:
+            shutil.rmtree(path)
+    for client in shards.values():
+        close_client(client)
+    if not dry_run:
+        print(f"✅ Migrated {total} chunks; start the API with VECTOR_STORE_LAYOUT=sharded")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--remove", action="store_true", help="delete each per-user directory after copying it")
+    parser.add_argument("--dry-run", action="store_true", help="only print where each user would go")
+    args = parser.parse_args(argv)
+    migrate(remove=args.remove, dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -45,6 +45,7 @@ class DocumentOut(BaseModel):
     file_size: int
     pages: int = 0
     chunks: int = 0
+    progress: int = 0  # percent of pages embedded
     status: str        # pending | processing | ready | error
     created_at: datetime
     user_id: str
@@ -76,5 +77,39 @@ class SessionOut(BaseModel):
     id: str
     title: str
     message_count: int
+    last_message: Optional[dict] = None   # {role, content (truncated), ts}
     created_at: str
     updated_at: str
+
+
+# ── Batch question answering ──────────────────────────────────────────────────
+
+class BatchJobRequest(BaseModel):
+    questions: List[str] = Field(..., min_length=1)
+    document_ids: Optional[List[str]] = None   # None = search all user docs
+
+
+class BatchJobOut(BaseModel):
+    id: str
+    status: str        # running | done | error
+    total: int
+    completed: int = 0
+    failed: int = 0
+    document_ids: Optional[List[str]] = None
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+
+class BatchResultOut(BaseModel):
+    index: int
+    question: str
+    answer: Optional[str] = None
+    sources: List[SourceOut] = []
+    error: Optional[str] = None
+
+
+class BatchResultsPage(BaseModel):
+    job: BatchJobOut
+    results: List[BatchResultOut]
+    next_cursor: Optional[int] = None   # pass as `after` for the next page
@@ -1,79 +1,602 @@
+import asyncio
+import contextvars
+import hashlib
+import math
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
 from langchain_chroma import Chroma
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from app.core.config import CHROMA_DIR
+from langchain_core.documents import Document
+from app.core.config import (
+    CHROMA_DIR,
+    CHROMA_MAX_OPEN_STORES,
+    CHROMA_MAX_OPEN_FILES,
+    CHROMA_STORE_IDLE_TTL,
+    VECTOR_STORE_LAYOUT,
+    VECTOR_SHARDS,
+    RAG_SEARCH_WORKERS,
+    RAG_SEARCH_TIMEOUT,
+    RAG_MAX_FETCH_K,
+    RAG_HYBRID,
+    RAG_RRF_K,
+    RAG_ROUTING,
+    RAG_ROUTE_TOP_DOCS,
+    RAG_ROUTE_REPRESENTATIVES,
+)
+from app import lexical_index
+from app.core.metrics import span
+from app.embedding_service import get_embeddings
 
-# ── Singleton embedding model (loaded once on first use) ──────────────────────
-_embeddings = None
 
+# ── Single writer ─────────────────────────────────────────────────────────────
+# Concurrent writers in different processes corrupt Chroma's HNSW files, so
+# whichever API process holds this lock does every vector write (ingestion runs
+# there). The others only read, and reopen a store once its data has changed.
+_writer_lock = None
+read_only = False
 
-def get_embeddings() -> HuggingFaceEmbeddings:
-    global _embeddings
-    if _embeddings is None:
-        print("Loading embedding model (first run may take a minute)…")
-        _embeddings = HuggingFaceEmbeddings(
-            model_name="all-MiniLM-L6-v2",
-            model_kwargs={"device": "cpu"},
-            encode_kwargs={"normalize_embeddings": True},
-        )
-        print("✅ Embedding model ready")
-    return _embeddings
+
+def claim_writer() -> bool:
+    """Try to become the process that writes to CHROMA_DIR; True if this one is it."""
+    global _writer_lock, read_only
+    if _writer_lock is not None:
+        return True
+    os.makedirs(CHROMA_DIR, exist_ok=True)
+    handle = open(os.path.join(CHROMA_DIR, ".writer.lock"), "a+")
+    try:
+        if os.name == "nt":
+            import msvcrt
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        read_only = True
+        return False
+    _writer_lock, read_only = handle, False
+    return True
+
+
+def _release_writer() -> None:
+    global _writer_lock
+    if _writer_lock is not None:
+        _writer_lock.close()  # closing the handle drops the lock
+        _writer_lock = None
+
+
+# ── Store registry (LRU + idle TTL) ───────────────────────────────────────────
+class _StoreEntry:
+    __slots__ = ("store", "routes", "files", "opening", "opened_at", "system", "last_used", "in_use")
+
+    def __init__(self):
+        self.store = None  # opened by the first borrower, outside the registry lock
+        self.routes = None  # routing collection, opened on first use
+        self.files = 0  # files under the store's directory, a bound on the handles it holds
+        self.opening = threading.Lock()
+        self.opened_at = time.time()  # compared with corpus versions (wall clock)
+        self.system = None  # set once replaced by a fresh copy; closed by its last borrower
+        self.last_used = time.monotonic()
+        self.in_use = 0
+
+
+_stores: "OrderedDict[str, _StoreEntry]" = OrderedDict()
+_stores_lock = threading.Lock()
+
+
+def shard_of(user_id: str) -> int:
+    # Stable across processes and restarts, unlike hash().
+    return int.from_bytes(hashlib.blake2b(user_id.encode(), digest_size=8).digest(), "big") % VECTOR_SHARDS
 
 
-def _get_store(user_id: str) -> Chroma:
-    """Return a per-user isolated Chroma vector store."""
-    path = os.path.join(CHROMA_DIR, f"user_{user_id}")
+def store_location(user_id: str, layout: str = None) -> tuple:
+    """(registry key, persist directory, collection name) holding a user's vectors.
+
+    In the sharded layout many users share a collection, so every read,
+    write and delete in this module filters on `user_id`.
+    """
+    if (layout or VECTOR_STORE_LAYOUT) == "sharded":
+        name = f"shard_{shard_of(user_id):03d}"
+        return name, os.path.join(CHROMA_DIR, "shards", name), name
+    return user_id, os.path.join(CHROMA_DIR, f"user_{user_id}"), f"u_{user_id}"
+
+
+def _open_store(path: str, collection: str) -> Chroma:
+    """Open a Chroma vector store from disk."""
     os.makedirs(path, exist_ok=True)
     return Chroma(
         embedding_function=get_embeddings(),
         persist_directory=path,
-        collection_name=f"u_{user_id}",
+        collection_name=collection,
     )
 
 
-def ingest(chunks: list, user_id: str, doc_id: str) -> None:
-    """Tag chunks with user/doc metadata then add to vector store."""
-    for chunk in chunks:
+def _count_files(path: str) -> int:
+    return sum(len(names) for _, _, names in os.walk(path))
+
+
+def _detach(client):
+    """Take `client`'s system out of Chroma's per-path cache, so the next open loads from disk."""
+    from chromadb.api.shared_system_client import SharedSystemClient
+    return SharedSystemClient._identifier_to_system.pop(getattr(client, "_identifier", None), None)
+
+
+def close_client(client, system=None) -> None:
+    """Stop a Chroma client so its SQLite/HNSW handles are released.
+
+    Pass the `system` of a client that was already detached.
+    """
+    try:
+        if system is None:
+            system = _detach(client)
+        if system is not None:
+            system.stop()
+    except Exception as e:
+        print(f"Close vector store error: {e}")
+
+
+def _close_entry(entry: _StoreEntry) -> None:
+    close_client(entry.store._client, entry.system)
+
+
+def _evict_locked(now: float) -> list:
+    """Pop idle-expired and over-capacity stores (oldest first). Caller holds the lock."""
+    victims = []
+    files = sum(e.files for e in _stores.values())
+    for key in list(_stores):
+        entry = _stores[key]
+        if entry.in_use:
+            continue
+        over_cap = len(_stores) > CHROMA_MAX_OPEN_STORES or files > CHROMA_MAX_OPEN_FILES
+        if over_cap or now - entry.last_used > CHROMA_STORE_IDLE_TTL:
+            del _stores[key]
+            files -= entry.files
+            if entry.store is not None:
+                victims.append(entry)
+    return victims
+
+
+@contextmanager
+def _store(user_id: str, write: bool = False, fresh_since: float = 0.0):
+    """Borrow the cached store holding a user's vectors, opening it on first use.
+
+    Opening reads from disk, so it happens under the entry's own lock: other
+    users' stores stay available meanwhile. `write` borrowers refresh the
+    entry's file count when they give it back. In a read-only process, a
+    store opened before `fresh_since` (the user's corpus version) is
+    replaced by a fresh copy, since the writer has changed it since.
+    """
+    key, path, collection = store_location(user_id)
+    stale = None
+    with _stores_lock:
+        entry = _stores.get(key)
+        if entry is not None and read_only and entry.opened_at < fresh_since:
+            del _stores[key]
+            if entry.store is not None:
+                entry.system = _detach(entry.store._client)
+                if not entry.in_use:
+                    stale = entry
+            entry = None
+        if entry is None:
+            entry = _stores[key] = _StoreEntry()
+        _stores.move_to_end(key)
+        entry.in_use += 1
+    if stale is not None:
+        _close_entry(stale)
+    try:
+        if entry.store is None:
+            with entry.opening:
+                if entry.store is None:
+                    entry.store = _open_store(path, collection)
+                    entry.files = _count_files(path)
+        yield entry.store
+    finally:
+        if write:
+            entry.files = _count_files(path)
+        with _stores_lock:
+            entry.in_use -= 1
+            entry.last_used = time.monotonic()
+            victims = _evict_locked(entry.last_used)
+            if entry.system is not None and not entry.in_use:
+                victims.append(entry)
+        for victim in victims:
+            _close_entry(victim)
+
+
+def close_stores() -> None:
+    """Close every open store (called at application shutdown)."""
+    lexical_index.close_all()
+    with _stores_lock:
+        victims = [e for e in _stores.values() if e.store is not None]
+        _stores.clear()
+    for victim in victims:
+        _close_entry(victim)
+    if victims:
+        print(f"Closed {len(victims)} vector store(s)")
+    _release_writer()
+
+
+# ── Ingest (content-addressed embedding reuse) ────────────────────────────────
+_REUSE_BATCH = 500
+
+
+def _chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _reuse_embeddings(col, user_id: str, hashes: list) -> dict:
+    """Map chunk hash → an embedding already stored for that exact text."""
+    found: dict = {}
+    for i in range(0, len(hashes), _REUSE_BATCH):
+        batch = hashes[i:i + _REUSE_BATCH]
+        res = col.get(
+            where={"$and": [{"user_id": user_id}, {"chunk_hash": {"$in": batch}}]},
+            include=["embeddings", "metadatas"],
+        )
+        # Chroma returns embeddings as a 2-D ndarray: never test it for truthiness.
+        for meta, vec in zip(res["metadatas"], res["embeddings"]):
+            found.setdefault(meta["chunk_hash"], [float(x) for x in vec])
+    return found
+
+
+def ingest(chunks: list, user_id: str, doc_id: str, offset: int = 0, flush: bool = True) -> None:
+    """Tag chunks with user/doc metadata then add to vector store.
+
+    Chunks whose text is already embedded anywhere in the user's store reuse
+    that vector; only new text goes through the embedding model. Rows stay
+    one-per-document, so deleting a document never touches another
+    document's vectors even when they share an embedding.
+
+    Callers feeding a document in batches pass the running chunk `offset`
+    (keeps ids stable) and `flush=False`, then call `finalize_doc` once.
+    """
+    if not chunks:
+        return
+    ids, texts, metas = [], [], []
+    for i, chunk in enumerate(chunks):
         chunk.metadata["user_id"] = user_id
         chunk.metadata["doc_id"] = doc_id
-    _get_store(user_id).add_documents(chunks)
+        chunk.metadata["chunk_hash"] = _chunk_hash(chunk.page_content)
+        ids.append(f"{doc_id}:{offset + i}")
+        texts.append(chunk.page_content)
+        metas.append(chunk.metadata)
+
+    with _store(user_id, write=True) as store:
+        col = store._collection
+        hashes = list({m["chunk_hash"] for m in metas})
+        vectors = _reuse_embeddings(col, user_id, hashes)
+
+        todo = {}
+        for text, meta in zip(texts, metas):
+            if meta["chunk_hash"] not in vectors:
+                todo.setdefault(meta["chunk_hash"], text)
+        if todo:
+            with span("embed_documents"):
+                embedded = get_embeddings().embed_documents(list(todo.values()))
+            vectors.update(zip(todo.keys(), embedded))
+
+        with _lexical(user_id, col) as index:
+            with span("vector_write"):
+                col.upsert(
+                    ids=ids,
+                    embeddings=[vectors[m["chunk_hash"]] for m in metas],
+                    metadatas=metas,
+                    documents=texts,
+                )
+            for cid, text in zip(ids, texts):
+                index.add(cid, doc_id, text)
+            index.save()
+        if flush:
+            _update_route(user_id, col, doc_id)
+    print(f"Ingested {len(ids)} chunks for {doc_id} ({len(todo)} embedded, {len(ids) - len(todo)} reused)")
+
 
+def finalize_doc(user_id: str, doc_id: str) -> None:
+    """Build the document's routing entry after batched ingest."""
+    with _store(user_id, write=True) as store:
+        _update_route(user_id, store._collection, doc_id)
 
-def search(query: str, user_id: str, doc_ids: list = None, top_k: int = 5) -> list:
-    """Return most relevant chunks for a query, scoped to this user."""
-    store = _get_store(user_id)
-    base_filter = {"user_id": user_id}
 
+def clone_doc(user_id: str, src_doc_id: str, doc_id: str) -> int:
+    """Copy another document's vectors verbatim (identical file re-uploaded)."""
+    with _store(user_id, write=True) as store:
+        col = store._collection
+        res = col.get(
+            where={"$and": [{"user_id": user_id}, {"doc_id": src_doc_id}]},
+            include=["embeddings", "metadatas", "documents"],
+        )
+        src_ids = res.get("ids") or []
+        if not src_ids:
+            return 0
+        ids = [f"{doc_id}:{sid.split(':', 1)[-1]}" for sid in src_ids]
+        metas = [{**m, "doc_id": doc_id} for m in res["metadatas"]]
+        with _lexical(user_id, col) as index:
+            col.upsert(
+                ids=ids,
+                embeddings=[[float(x) for x in vec] for vec in res["embeddings"]],
+                metadatas=metas,
+                documents=res["documents"],
+            )
+            for cid, text in zip(ids, res["documents"]):
+                index.add(cid, doc_id, text)
+            index.save()
+        _update_route(user_id, col, doc_id)
+    return len(src_ids)
+
+
+# ── Document routing (centroid + representative chunks per document) ─────────
+_routed_users: set = set()  # users whose routing entries were checked for gaps this run
+_routed_lock = threading.Lock()
+
+
+def _routes(user_id: str):
+    """The routing collection stored beside a user's chunks. Call while borrowing the store.
+
+    None in a read-only process until the writer has created it.
+    """
+    key, path, collection = store_location(user_id)
+    with _stores_lock:
+        entry = _stores[key]
+    if entry.routes is None:
+        with entry.opening:
+            if entry.routes is None:
+                client, name = entry.store._client, f"{collection}_routes"
+                if not read_only:
+                    entry.routes = client.get_or_create_collection(name, metadata={"hnsw:space": "cosine"})
+                elif name in {c if isinstance(c, str) else c.name for c in client.list_collections()}:
+                    entry.routes = client.get_collection(name)
+                else:
+                    return None
+                entry.files = _count_files(path)
+    return entry.routes
+
+
+def _doc_summary(vectors: np.ndarray) -> list:
+    """Normalised centroid plus up to RAG_ROUTE_REPRESENTATIVES mutually distant chunks."""
+    centroid = vectors.mean(axis=0)
+    centroid /= np.linalg.norm(centroid) or 1.0
+    picks = [int(np.argmax(vectors @ centroid))]
+    while len(picks) < min(RAG_ROUTE_REPRESENTATIVES, len(vectors)):
+        nearest_pick = (vectors @ vectors[picks].T).max(axis=1)
+        picks.append(int(np.argmin(nearest_pick)))
+    return [centroid.tolist()] + [vectors[i].tolist() for i in picks]
+
+
+def _update_route(user_id: str, col, doc_id: str) -> None:
+    scope = {"$and": [{"user_id": user_id}, {"doc_id": doc_id}]}
+    res = col.get(where=scope, include=["embeddings"])
+    routes = _routes(user_id)
+    routes.delete(where=scope)
+    if not res["ids"]:
+        return
+    summary = _doc_summary(np.asarray(res["embeddings"], dtype=np.float32))
+    routes.upsert(
+        ids=[f"{doc_id}:route{i}" for i in range(len(summary))],
+        embeddings=summary,
+        metadatas=[{"user_id": user_id, "doc_id": doc_id}] * len(summary),
+    )
+
+
+def _backfill_routes(user_id: str, col) -> bool:
+    """Route documents ingested before routing existed (once per user per process).
+
+    A read-only process can't write the entries: it returns False while any
+    document still lacks one, and the caller searches without routing.
+    """
+    with _routed_lock:
+        if user_id in _routed_users:
+            return True
+    routes = _routes(user_id)
+    if routes is None:
+        return False
+    routed = {m["doc_id"] for m in routes.get(where={"user_id": user_id}, include=["metadatas"])["metadatas"]}
+    with _lexical(user_id, col) as index:
+        missing = index.doc_ids() - routed
+    if missing and read_only:
+        return False
+    if missing:
+        print(f"Building routing entries for {len(missing)} document(s) of user {user_id}…")
+    for doc_id in missing:
+        _update_route(user_id, col, doc_id)
+    with _routed_lock:
+        _routed_users.add(user_id)
+    return True
+
+
+def _route(user_id: str, col, query_vec: list):
+    """The RAG_ROUTE_TOP_DOCS documents closest to the query, or None when the user has no more than that."""
+    if not _backfill_routes(user_id, col):
+        return None
+    res = _routes(user_id).query(
+        query_embeddings=[query_vec],
+        n_results=RAG_ROUTE_TOP_DOCS * (RAG_ROUTE_REPRESENTATIVES + 1),
+        where={"user_id": user_id},
+        include=["metadatas"],
+    )
+    picked = []
+    for meta in res["metadatas"][0]:
+        if meta["doc_id"] not in picked:
+            picked.append(meta["doc_id"])
+            if len(picked) == RAG_ROUTE_TOP_DOCS:
+                return picked
+    # Each document has at most RAG_ROUTE_REPRESENTATIVES + 1 entries, so
+    # fewer distinct documents means these are all of them.
+    return None
+
+
+# ── Search (one filtered query, score-ordered merge) ──────────────────────────
+def _scope_filter(user_id: str, doc_ids: list = None) -> dict:
+    if not doc_ids:
+        return {"user_id": user_id}
+    doc_clause = {"doc_id": doc_ids[0]} if len(doc_ids) == 1 else {"doc_id": {"$in": list(doc_ids)}}
+    return {"$and": [{"user_id": user_id}, doc_clause]}
+
+
+def _merge(hits: list, top_k: int, doc_ids: list = None) -> list:
+    """Dedup by chunk and keep the best `top_k` by score, with a per-document quota.
+
+    The quota gives each selected document a fair share of the slots first;
+    slots a document cannot fill go to the next-best hits overall.
+    """
+    hits = sorted(hits, key=lambda h: h.metadata["score"], reverse=True)
+    unique, seen = [], set()
+    for h in hits:
+        key = h.metadata.get("chunk_hash") or h.metadata["chunk_id"]
+        if key not in seen:
+            seen.add(key)
+            unique.append(h)
+
+    if not doc_ids or len(doc_ids) < 2:
+        return unique[:top_k]
+
+    quota = math.ceil(top_k / len(doc_ids))
+    taken, per_doc, leftover = [], {}, []
+    for h in unique:
+        did = h.metadata.get("doc_id")
+        if len(taken) < top_k and per_doc.get(did, 0) < quota:
+            per_doc[did] = per_doc.get(did, 0) + 1
+            taken.append(h)
+        else:
+            leftover.append(h)
+    taken.extend(leftover[:top_k - len(taken)])
+    return sorted(taken, key=lambda h: h.metadata["score"], reverse=True)
+
+
+@contextmanager
+def _lexical(user_id: str, col):
+    """Borrow the user's BM25 index, rebuilt from the collection if it was never written."""
+    with lexical_index.borrow(user_id) as index:
+        if not len(index) and col.get(
+            where={"user_id": user_id}, limit=1, include=[]
+        )["ids"]:
+            _rebuild_lexical(user_id, col, index)
+        yield index
+
+
+def _rebuild_lexical(user_id: str, col, index: lexical_index.LexicalIndex) -> None:
+    print(f"Building lexical index for user {user_id}…")
+    offset = 0
+    while True:
+        page = col.get(
+            where={"user_id": user_id}, include=["documents", "metadatas"], limit=1000, offset=offset
+        )
+        if not page["ids"]:
+            break
+        for cid, text, meta in zip(page["ids"], page["documents"], page["metadatas"]):
+            index.add(cid, meta.get("doc_id", ""), text)
+        offset += len(page["ids"])
+    index.save()
+
+
+def _fuse(*ranked_lists: list) -> list:
+    """Reciprocal-rank fusion; writes the fused score into each hit's metadata."""
+    fused: dict = {}
+    for ranked in ranked_lists:
+        for rank, hit in enumerate(ranked):
+            cid = hit.metadata["chunk_id"]
+            entry = fused.setdefault(cid, hit)
+            entry.metadata["score"] = entry.metadata.get("score", 0.0) + 1.0 / (RAG_RRF_K + rank + 1)
+    return list(fused.values())
+
+
+def search(
+    query: str, user_id: str, doc_ids: list = None, top_k: int = 5, query_vec: list = None, corpus_version: float = 0.0
+) -> list:
+    """Return most relevant chunks for a query, scoped to this user.
+
+    Dense and BM25 results are combined with reciprocal-rank fusion. Each hit
+    carries `chunk_id` and `score` (fused, higher is better) in its metadata.
+    Pass `query_vec` when the question has already been embedded, and the
+    user's `corpus_version` so another process's writes are seen.
+
+    Without `doc_ids`, a user with many documents is first routed to the few
+    whose summary vectors are closest to the query, and only those are searched.
+    """
+    fetch_k = top_k if not doc_ids or len(doc_ids) < 2 else min(top_k * len(doc_ids), RAG_MAX_FETCH_K)
     try:
-        if doc_ids and len(doc_ids) == 1:
-            base_filter["doc_id"] = doc_ids[0]
-            return store.similarity_search(query, k=top_k, filter=base_filter)
-
-        if doc_ids and len(doc_ids) > 1:
-            results = []
-            seen: set = set()
-            for did in doc_ids:
-                hits = store.similarity_search(query, k=3, filter={"user_id": user_id, "doc_id": did})
-                for h in hits:
-                    key = h.page_content[:80]
-                    if key not in seen:
-                        seen.add(key)
-                        results.append(h)
-            return results[:top_k]
-
-        return store.similarity_search(query, k=top_k, filter=base_filter)
+        if query_vec is None:
+            with span("embed_query"):
+                query_vec = get_embeddings().embed_query(query)
+        with _store(user_id, fresh_since=corpus_version) as store:
+            col = store._collection
+            scope = doc_ids
+            if not doc_ids and RAG_ROUTING:
+                with span("route_docs"):
+                    scope = _route(user_id, col, query_vec)
+            with span("vector_search"):
+                res = col.query(
+                    query_embeddings=[query_vec],
+                    n_results=fetch_k,
+                    where=_scope_filter(user_id, scope),
+                    include=["documents", "metadatas"],
+                )
+            dense = [
+                Document(page_content=text, metadata={**meta, "chunk_id": cid})
+                for cid, text, meta in zip(res["ids"][0], res["documents"][0], res["metadatas"][0])
+            ]
+
+            lexical = []
+            if RAG_HYBRID:
+                with span("lexical_search"):
+                    with _lexical(user_id, col) as index:
+                        ranked = index.search(query, fetch_k, scope)
+                known = {h.metadata["chunk_id"]: h for h in dense}
+                missing = [cid for cid, _ in ranked if cid not in known]
+                if missing:
+                    got = col.get(ids=missing, where={"user_id": user_id}, include=["documents", "metadatas"])
+                    for cid, text, meta in zip(got["ids"], got["documents"], got["metadatas"]):
+                        known[cid] = Document(page_content=text, metadata={**meta, "chunk_id": cid})
+                lexical = [known[cid] for cid, _ in ranked if cid in known]
     except Exception as e:
         print(f"Vector search error: {e}")
         return []
 
+    return _merge(_fuse(dense, lexical), top_k, doc_ids)
+
+
+# ── Async entry points (bounded pool, off the event loop) ─────────────────────
+_search_pool = ThreadPoolExecutor(max_workers=RAG_SEARCH_WORKERS, thread_name_prefix="rag-search")
+
+
+async def _in_search_pool(fn, *args):
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()  # so spans inside land in the request breakdown
+    fut = loop.run_in_executor(_search_pool, ctx.run, fn, *args)
+    return await asyncio.wait_for(fut, timeout=RAG_SEARCH_TIMEOUT)
+
+
+async def asearch(
+    query: str, user_id: str, doc_ids: list = None, top_k: int = 5, query_vec: list = None, corpus_version: float = 0.0
+) -> list:
+    """Run `search` in the bounded search pool; raises asyncio.TimeoutError on overrun."""
+    return await _in_search_pool(search, query, user_id, doc_ids, top_k, query_vec, corpus_version)
+
+
+async def aembed_query(query: str) -> list:
+    """Embed a question in the search pool (query priority)."""
+    return await _in_search_pool(get_embeddings().embed_query, query)
+
+
+def shutdown_pool() -> None:
+    _search_pool.shutdown(wait=False, cancel_futures=True)
+
 
 def delete_doc(user_id: str, doc_id: str) -> None:
     """Remove all vectors belonging to a document."""
     try:
-        store = _get_store(user_id)
-        col = store._collection
-        existing = col.get(where={"doc_id": doc_id})
-        if existing and existing.get("ids"):
-            col.delete(ids=existing["ids"])
+        with _store(user_id, write=True) as store:
+            col = store._collection
+            existing = col.get(where={"$and": [{"user_id": user_id}, {"doc_id": doc_id}]}, include=[])
+            if existing and existing.get("ids"):
+                col.delete(ids=existing["ids"])
+            _routes(user_id).delete(where={"$and": [{"user_id": user_id}, {"doc_id": doc_id}]})
+            with lexical_index.borrow(user_id) as index:
+                index.remove_doc(doc_id)
+                index.save()
     except Exception as e:
         print(f"Delete vector error: {e}")
@@ -9,6 +9,7 @@ from app.core.security import (
     verify_password,
     create_access_token,
     get_current_user,
+    invalidate_principal,
 )
 from app.models.schemas import (
     RegisterRequest,
@@ -44,7 +45,7 @@ async def register(body: RegisterRequest):
         "full_name": body.full_name or body.username,
         "username": body.username,
         "email": body.email,
-        "hashed_password": body.password,
+        "hashed_password": await hash_password(body.password),
         "created_at": datetime.utcnow(),
     }
     result = await db["users"].insert_one(doc)
@@ -58,8 +59,13 @@ async def register(body: RegisterRequest):
 async def login(body: LoginRequest):
     db = get_db()
     user = await db["users"].find_one({"email": body.email})
-    # if not user or not verify_password(body.password, user["hashed_password"]):
-    #     raise HTTPException(status_code=401, detail="Invalid email or password")
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+    valid, new_hash = await verify_password(body.password, user.get("hashed_password", ""))
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+    if new_hash:
+        await db["users"].update_one({"_id": user["_id"]}, {"$set": {"hashed_password": new_hash}})
 
     count = await db["documents"].count_documents(
         {"user_id": str(user["_id"]), "status": "ready"}
@@ -91,6 +97,7 @@ async def update_profile(body: ProfileUpdate, current_user=Depends(get_current_u
         await db["users"].update_one(
             {"_id": ObjectId(current_user["id"])}, {"$set": updates}
         )
+        invalidate_principal(current_user["id"])
 
     updated = await db["users"].find_one({"_id": ObjectId(current_user["id"])})
     count = await db["documents"].count_documents(
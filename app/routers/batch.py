@@ -0,0 +1,181 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import List
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from app import batch_qa
+from app.core.config import BATCH_MAX_QUESTIONS, BATCH_LEASE_SECONDS, DOC_EVENTS_KEEPALIVE
+from app.core.database import get_db
+from app.core.security import get_current_user
+from app.core.sse import sse
+from app.models.schemas import BatchJobRequest, BatchJobOut, BatchResultOut, BatchResultsPage
+from app.routers.chat import check_ownership
+
+router = APIRouter(prefix="/api/batch", tags=["batch"])
+
+_JOB_FIELDS = {"questions": 0}  # never sent back; can be hundreds of strings
+
+
+def _job_out(j: dict) -> BatchJobOut:
+    return BatchJobOut(
+        id=str(j["_id"]),
+        status=j["status"],
+        total=j["total"],
+        completed=j.get("completed", 0),
+        failed=j.get("failed", 0),
+        document_ids=j.get("document_ids"),
+        error=j.get("error"),
+        created_at=j["created_at"],
+        finished_at=j.get("finished_at"),
+    )
+
+
+def _result_out(r: dict) -> BatchResultOut:
+    return BatchResultOut(
+        index=r["index"],
+        question=r["question"],
+        answer=r.get("answer"),
+        sources=r.get("sources", []),
+        error=r.get("error"),
+    )
+
+
+async def _get_job(db, job_id: str, user_id: str) -> dict:
+    try:
+        oid = ObjectId(job_id)
+    except (InvalidId, TypeError):
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    job = await db["batch_jobs"].find_one({"_id": oid, "user_id": user_id}, _JOB_FIELDS)
+    if not job:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return job
+
+
+@router.post("/jobs", response_model=BatchJobOut, status_code=202)
+async def create_job(body: BatchJobRequest, current_user=Depends(get_current_user)):
+    """Queue a list of questions against a document set; answers are fetched by job id."""
+    questions = [q.strip() for q in body.questions]
+    if not all(questions):
+        raise HTTPException(status_code=400, detail="Questions must not be empty")
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_QUESTIONS} questions per job")
+
+    db = get_db()
+    user_id = current_user["id"]
+    await check_ownership(db, user_id, body.document_ids)  # once for the whole job
+
+    now = datetime.utcnow()
+    record = {
+        "user_id": user_id,
+        "document_ids": body.document_ids,
+        "questions": questions,
+        "total": len(questions),
+        "completed": 0,
+        "failed": 0,
+        "status": "running",
+        "lease_until": now + timedelta(seconds=BATCH_LEASE_SECONDS),
+        "created_at": now,
+    }
+    result = await db["batch_jobs"].insert_one(record)
+    record["_id"] = result.inserted_id
+    batch_qa.start(db, record)
+    return _job_out(record)
+
+
+@router.get("/jobs", response_model=List[BatchJobOut])
+async def list_jobs(current_user=Depends(get_current_user)):
+    db = get_db()
+    jobs = (
+        await db["batch_jobs"]
+        .find({"user_id": current_user["id"]}, _JOB_FIELDS)
+        .sort("created_at", -1)
+        .to_list(50)
+    )
+    return [_job_out(j) for j in jobs]
+
+
+@router.get("/jobs/{job_id}", response_model=BatchJobOut)
+async def get_job(job_id: str, current_user=Depends(get_current_user)):
+    return _job_out(await _get_job(get_db(), job_id, current_user["id"]))
+
+
+@router.get("/jobs/{job_id}/results", response_model=BatchResultsPage)
+async def get_results(
+    job_id: str,
+    after: int = Query(-1, ge=-1, description="Cursor from a previous page's next_cursor"),
+    limit: int = Query(50, ge=1, le=200),
+    current_user=Depends(get_current_user),
+):
+    """Answered questions in question order.
+
+    Questions finish out of order, so while the job is running a page can skip
+    ones still in progress: page through a `done` job, or use `/stream`.
+    """
+    db = get_db()
+    job = await _get_job(db, job_id, current_user["id"])
+    results = (
+        await db["batch_results"]
+        .find({"job_id": job_id, "index": {"$gt": after}}, {"_id": 0})
+        .sort("index", 1)
+        .limit(limit)
+        .to_list(limit)
+    )
+    return BatchResultsPage(
+        job=_job_out(job),
+        results=[_result_out(r) for r in results],
+        next_cursor=results[-1]["index"] if results else None,
+    )
+
+
+@router.get("/jobs/{job_id}/stream")
+async def stream_results(job_id: str, current_user=Depends(get_current_user)):
+    """Server-sent events: a `result` per answered question, then `done` with the final job.
+
+    Results already stored are sent first, so reconnecting replays the job.
+    """
+    db = get_db()
+    user_id = current_user["id"]
+    await _get_job(db, job_id, user_id)
+
+    async def events():
+        # Results finish out of question order, so the cursor is the insertion-ordered _id.
+        filt = {"job_id": job_id}
+        while True:
+            progress = batch_qa.watch(job_id)  # before reading, so no result slips past
+            job = await db["batch_jobs"].find_one({"_id": ObjectId(job_id)}, _JOB_FIELDS)
+            if job is None:
+                yield sse("error", {"detail": "Batch job deleted"})
+                return
+            fresh = await db["batch_results"].find(filt).sort("_id", 1).to_list(None)
+            for r in fresh:
+                yield sse("result", _result_out(r).model_dump())
+            if fresh:
+                filt["_id"] = {"$gt": fresh[-1]["_id"]}
+            if job["status"] != "running":
+                yield sse("done", _job_out(job).model_dump())
+                return
+            # Woken by results stored in this process; the timeout covers jobs run elsewhere.
+            try:
+                await asyncio.wait_for(progress.wait(), timeout=DOC_EVENTS_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.delete("/jobs/{job_id}", status_code=204)
+async def delete_job(job_id: str, current_user=Depends(get_current_user)):
+    """Stop a job if it is still running and delete it with its results."""
+    db = get_db()
+    job = await _get_job(db, job_id, current_user["id"])
+    batch_qa.cancel(job_id)
+    await db["batch_jobs"].delete_one({"_id": job["_id"]})
+    await db["batch_results"].delete_many({"job_id": job_id})
@@ -1,36 +1,26 @@
-import os
+import asyncio
 import uuid
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
-from bson import ObjectId
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
 
 from app.core.database import get_db
+from app.core.doc_cache import get_doc_meta
+from app.core.metrics import span
 from app.core.security import get_current_user
-from app.core.config import GROQ_API_KEY
+from app.core.sse import sse
+from app.core.config import CONTEXT_CANDIDATES
 from app.models.schemas import QueryRequest, QueryResponse, SourceOut, SessionOut
-from app.rag_engine import search
+from app import answer_cache, corpus, llm_gateway
+from app.context_packer import pack
+from app.rag_engine import asearch, aembed_query
 
 router = APIRouter(prefix="/api/chat", tags=["chat"])
 
-# ── LLM setup ─────────────────────────────────────────────────────────────────
-_llm = None
-
-def get_llm():
-    global _llm
-    if _llm is None:
-        if not GROQ_API_KEY or GROQ_API_KEY == "your_groq_api_key_here":
-            raise HTTPException(
-                status_code=503,
-                detail="GROQ_API_KEY not set in .env file. Get a free key at https://console.groq.com",
-            )
-        os.environ["GROQ_API_KEY"] = GROQ_API_KEY
-        from langchain_groq import ChatGroq
-        _llm = ChatGroq(model="llama-3.3-70b-versatile", temperature=0.1)
-    return _llm
-
-
 SYSTEM_PROMPT = """You are DocMind AI, an intelligent document assistant.
 Answer questions using ONLY the context provided below.
 Be clear, helpful, and concise.
@@ -38,39 +28,60 @@ If the answer is not in the context, say: "I couldn't find that information in y
 Never make up information."""
 
 
-# ── Endpoints ─────────────────────────────────────────────────────────────────
+# ── Pipeline helpers (also used by the batch router) ──────────────────────────
 
-@router.post("/query", response_model=QueryResponse)
-async def query(body: QueryRequest, current_user=Depends(get_current_user)):
-    db = get_db()
-    user_id = current_user["id"]
-
-    # Validate doc ownership
-    if body.document_ids:
-        for did in body.document_ids:
-            doc = await db["documents"].find_one(
-                {"_id": ObjectId(did), "user_id": user_id}
-            )
-            if not doc:
+async def check_ownership(db, user_id: str, document_ids) -> None:
+    if document_ids:
+        with span("ownership"):
+            owned = await get_doc_meta(db, user_id, document_ids)
+        for did in document_ids:
+            if did not in owned:
                 raise HTTPException(
                     status_code=403, detail=f"Document {did} not found or access denied"
                 )
 
-    # Retrieve relevant chunks
-    hits = search(body.question, user_id=user_id, doc_ids=body.document_ids, top_k=5)
-    context = "\n\n---\n\n".join(h.page_content for h in hits) if hits else "No documents found."
 
-    # Build prompt and call LLM
-    llm = get_llm()
+async def _embed_question(question: str) -> list:
+    try:
+        with span("embed_query"):
+            return await aembed_query(question)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Document search timed out")
+
+
+async def _retrieve(question: str, user_id: str, document_ids, query_vec: list, version: float) -> list:
+    """Retrieve relevant chunks (embedding + vector search run in the search pool)."""
+    try:
+        with span("retrieve"):
+            return await asearch(
+                question, user_id=user_id, doc_ids=document_ids, top_k=CONTEXT_CANDIDATES,
+                query_vec=query_vec, corpus_version=version,
+            )
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Document search timed out")
+
+
+async def build_messages(question: str, hits: list):
+    """Pack hits into the token budget; returns (messages, hits actually used)."""
     from langchain_core.messages import SystemMessage, HumanMessage
+    # Tokenising (and the one-off tokenizer load) stays off the event loop.
+    with span("pack_context"):
+        context, used, stats = await asyncio.to_thread(pack, hits)
+    if stats["saved_tokens"]:
+        print(f"Context packed: {stats['packed_tokens']} tokens ({stats['saved_tokens']} saved)")
     messages = [
         SystemMessage(content=SYSTEM_PROMPT),
-        HumanMessage(content=f"Context:\n{context}\n\nQuestion: {body.question}"),
+        HumanMessage(content=f"Context:\n{context or 'No documents found.'}\n\nQuestion: {question}"),
     ]
-    response = llm.invoke(messages)
-    answer = response.content
+    return messages, used
+
+
+async def build_sources(db, user_id: str, hits: list) -> List[SourceOut]:
+    """Build the deduplicated sources list for a set of hits."""
+    # Friendly filenames for every hit in one (usually cached) lookup
+    with span("source_names"):
+        names = await get_doc_meta(db, user_id, [h.metadata["doc_id"] for h in hits if h.metadata.get("doc_id")])
 
-    # Build sources list (deduplicated)
     sources: List[SourceOut] = []
     seen: set = set()
     for hit in hits:
@@ -79,13 +90,10 @@ async def query(body: QueryRequest, current_user=Depends(get_current_user)):
             continue
         seen.add(key)
 
-        # Try to get the friendly filename from MongoDB
-        did = hit.metadata.get("doc_id", "")
         friendly = hit.metadata.get("source", "Unknown")
-        if did:
-            db_doc = await db["documents"].find_one({"_id": ObjectId(did)})
-            if db_doc:
-                friendly = db_doc.get("original_name", friendly)
+        meta = names.get(hit.metadata.get("doc_id", ""))
+        if meta:
+            friendly = meta.get("original_name") or friendly
 
         excerpt = hit.page_content
         if len(excerpt) > 350:
@@ -96,31 +104,121 @@ async def query(body: QueryRequest, current_user=Depends(get_current_user)):
             source=friendly,
             page=hit.metadata.get("page", 0) + 1,
         ))
+    return sources
 
-    # Persist chat session
-    now = datetime.utcnow()
-    session_id = body.session_id or str(uuid.uuid4())
 
-    user_msg = {"role": "user", "content": body.question, "sources": None, "ts": now}
+async def _migrate_legacy_session(db, session_id: str) -> None:
+    """Move messages embedded in an old-style session into `chat_messages`.
+
+    Safe to run concurrently: the unique (session_id, seq) index rejects
+    duplicate copies, and `messages` is only unset once they are all stored.
+    """
+    legacy = await db["chat_sessions"].find_one({"_id": session_id, "messages": {"$exists": True}})
+    if not legacy:
+        return
+    msgs = legacy.get("messages", [])
+    if msgs:
+        try:
+            await db["chat_messages"].insert_many(
+                [{"session_id": session_id, "user_id": legacy["user_id"], "seq": i, **m} for i, m in enumerate(msgs)],
+                ordered=False,
+            )
+        except BulkWriteError as e:
+            if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+                raise
+    last = msgs[-1] if msgs else None
+    await db["chat_sessions"].update_one(
+        {"_id": session_id, "messages": {"$exists": True}},
+        {
+            "$set": {"message_count": len(msgs), "last_message": _summary(last) if last else None},
+            "$unset": {"messages": ""},
+        },
+    )
+
+
+def _summary(msg: dict) -> dict:
+    content = msg["content"]
+    return {
+        "role": msg["role"],
+        "content": content[:200] + ("…" if len(content) > 200 else ""),
+        "ts": msg["ts"],
+    }
+
+
+async def _save_session(db, user_id: str, session_id, question: str, answer: str,
+                        sources: List[SourceOut], now: datetime) -> str:
+    """Append the question/answer pair to a chat session, creating it if needed."""
+    session_id = session_id or str(uuid.uuid4())
+
+    user_msg = {"role": "user", "content": question, "sources": None, "ts": now}
     ai_msg = {"role": "assistant", "content": answer, "sources": [s.model_dump() for s in sources], "ts": now}
 
-    existing = await db["chat_sessions"].find_one({"_id": session_id, "user_id": user_id})
-    if existing:
-        await db["chat_sessions"].update_one(
-            {"_id": session_id},
-            {"$push": {"messages": {"$each": [user_msg, ai_msg]}}, "$set": {"updated_at": now}},
+    # Reserve two sequence numbers on the session; legacy sessions are migrated first.
+    update = {"$inc": {"message_count": 2}, "$set": {"updated_at": now, "last_message": _summary(ai_msg)}}
+    match = {"_id": session_id, "user_id": user_id, "messages": {"$exists": False}}
+    session = await db["chat_sessions"].find_one_and_update(
+        match, update, projection={"message_count": 1}, return_document=ReturnDocument.AFTER
+    )
+    if session is None and await db["chat_sessions"].count_documents({"_id": session_id, "user_id": user_id}):
+        await _migrate_legacy_session(db, session_id)
+        session = await db["chat_sessions"].find_one_and_update(
+            match, update, projection={"message_count": 1}, return_document=ReturnDocument.AFTER
         )
+
+    if session is not None:
+        first_seq = session["message_count"] - 2
     else:
-        title = body.question[:60] + ("…" if len(body.question) > 60 else "")
+        first_seq = 0
+        title = question[:60] + ("…" if len(question) > 60 else "")
         await db["chat_sessions"].insert_one({
             "_id": session_id,
             "user_id": user_id,
             "title": title,
-            "messages": [user_msg, ai_msg],
+            "message_count": 2,
+            "last_message": _summary(ai_msg),
             "created_at": now,
             "updated_at": now,
         })
 
+    await db["chat_messages"].insert_many([
+        {"session_id": session_id, "user_id": user_id, "seq": first_seq + i, **m}
+        for i, m in enumerate([user_msg, ai_msg])
+    ])
+    return session_id
+
+
+# ── Endpoints ─────────────────────────────────────────────────────────────────
+
+@router.post("/query", response_model=QueryResponse)
+async def query(body: QueryRequest, current_user=Depends(get_current_user)):
+    db = get_db()
+    user_id = current_user["id"]
+
+    await check_ownership(db, user_id, body.document_ids)
+    version = await corpus.version(db, user_id)
+    vec = await _embed_question(body.question)
+
+    with span("answer_cache"):
+        cached = answer_cache.lookup(user_id, body.document_ids, vec, version)
+    if cached:
+        answer, cached_sources = cached
+        sources = [SourceOut(**src) for src in cached_sources]
+    else:
+        hits = await _retrieve(body.question, user_id, body.document_ids, vec, version)
+
+        # Build prompt and call LLM (identical in-flight prompts share one call)
+        messages, hits = await build_messages(body.question, hits)
+        with span("llm"):
+            answer = await llm_gateway.generate(user_id, messages)
+
+        sources = await build_sources(db, user_id, hits)
+        answer_cache.store(user_id, body.document_ids, vec, answer, [src.model_dump() for src in sources], version)
+
+    # Persist chat session
+    now = datetime.utcnow()
+    with span("session_write"):
+        session_id = await _save_session(db, user_id, body.session_id, body.question, answer, sources, now)
+
     return QueryResponse(
         question=body.question,
         answer=answer,
@@ -130,21 +228,92 @@ async def query(body: QueryRequest, current_user=Depends(get_current_user)):
     )
 
 
+@router.post("/query/stream")
+async def query_stream(body: QueryRequest, current_user=Depends(get_current_user)):
+    """Server-sent events: `sources` first, then `token` deltas, then `done`.
+
+    A failure after the stream has started is reported as an `error` event.
+    """
+    db = get_db()
+    user_id = current_user["id"]
+
+    # Errors up to here are still returned as regular HTTP errors.
+    await check_ownership(db, user_id, body.document_ids)
+    version = await corpus.version(db, user_id)
+    vec = await _embed_question(body.question)
+    with span("answer_cache"):
+        cached = answer_cache.lookup(user_id, body.document_ids, vec, version)
+    if cached:
+        sources = [SourceOut(**src) for src in cached[1]]
+    else:
+        hits = await _retrieve(body.question, user_id, body.document_ids, vec, version)
+        messages, hits = await build_messages(body.question, hits)
+        sources = await build_sources(db, user_id, hits)
+        # Admission (429) and first-token errors still come back as HTTP errors.
+        with span("llm_first_token"):
+            flight = await llm_gateway.open_stream(user_id, messages)
+
+    async def generate():
+        if cached:
+            yield cached[0]
+            return
+        async for text in flight.replay():
+            yield text
+
+    async def events():
+        yield sse("sources", [src.model_dump() for src in sources])
+        parts: List[str] = []
+        try:
+            with span("llm_stream"):
+                async for text in generate():
+                    parts.append(text)
+                    yield sse("token", {"text": text})
+        except Exception as e:
+            print(f"Streaming LLM error: {e}")
+            if isinstance(e, asyncio.TimeoutError):
+                detail = "The language model took too long to respond"
+            else:
+                detail = "Generation failed"
+            yield sse("error", {"detail": detail})
+            return
+
+        answer = "".join(parts)
+        if not cached:
+            answer_cache.store(user_id, body.document_ids, vec, answer, [src.model_dump() for src in sources], version)
+        now = datetime.utcnow()
+        with span("session_write"):
+            session_id = await _save_session(db, user_id, body.session_id, body.question, answer, sources, now)
+        yield sse("done", {"session_id": session_id, "created_at": now.isoformat()})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/sessions", response_model=List[SessionOut])
 async def list_sessions(current_user=Depends(get_current_user)):
     db = get_db()
-    sessions = (
-        await db["chat_sessions"]
-        .find({"user_id": current_user["id"]})
-        .sort("updated_at", -1)
-        .limit(50)
-        .to_list(50)
-    )
+    # Counts come from the maintained field; old sessions are sized server-side.
+    sessions = await db["chat_sessions"].aggregate([
+        {"$match": {"user_id": current_user["id"]}},
+        {"$sort": {"updated_at": -1}},
+        {"$limit": 50},
+        {"$project": {
+            "title": 1,
+            "created_at": 1,
+            "updated_at": 1,
+            "last_message": 1,
+            "message_count": {"$ifNull": ["$message_count", {"$size": {"$ifNull": ["$messages", []]}}]},
+        }},
+    ]).to_list(50)
     return [
         SessionOut(
             id=str(s["_id"]),
             title=s.get("title", "Untitled"),
-            message_count=len(s.get("messages", [])),
+            message_count=s["message_count"],
+            last_message=s.get("last_message"),
             created_at=s["created_at"].isoformat(),
             updated_at=s["updated_at"].isoformat(),
         )
@@ -153,17 +322,46 @@ async def list_sessions(current_user=Depends(get_current_user)):
 
 
 @router.get("/sessions/{session_id}")
-async def get_session(session_id: str, current_user=Depends(get_current_user)):
+async def get_session(
+    session_id: str,
+    before: Optional[int] = Query(None, ge=0, description="Cursor from a previous page's next_cursor"),
+    limit: int = Query(50, ge=1, le=200),
+    current_user=Depends(get_current_user),
+):
+    """Session metadata plus one page of messages, newest page first.
+
+    Messages within a page are in chronological order; pass `next_cursor` as
+    `before` to fetch the page preceding it (null when there is none).
+    """
     db = get_db()
     session = await db["chat_sessions"].find_one(
-        {"_id": session_id, "user_id": current_user["id"]}
+        {"_id": session_id, "user_id": current_user["id"]}, {"messages": 0}
     )
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
+    if "message_count" not in session:
+        await _migrate_legacy_session(db, session_id)
+        session = await db["chat_sessions"].find_one({"_id": session_id})
+
+    filt = {"session_id": session_id}
+    if before is not None:
+        filt["seq"] = {"$lt": before}
+    messages = (
+        await db["chat_messages"]
+        .find(filt, {"_id": 0, "session_id": 0, "user_id": 0})
+        .sort("seq", -1)
+        .limit(limit)
+        .to_list(limit)
+    )
+    messages.reverse()
+    next_cursor = messages[0]["seq"] if messages and messages[0]["seq"] > 0 else None
+
     return {
         "id": str(session["_id"]),
         "title": session.get("title", "Untitled"),
-        "messages": session.get("messages", []),
+        "message_count": session.get("message_count", 0),
+        "messages": messages,
+        "next_cursor": next_cursor,
         "created_at": session["created_at"].isoformat(),
         "updated_at": session["updated_at"].isoformat(),
     }
@@ -177,3 +375,4 @@ async def delete_session(session_id: str, current_user=Depends(get_current_user)
     )
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Session not found")
+    await db["chat_messages"].delete_many({"session_id": session_id})
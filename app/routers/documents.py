@@ -1,22 +1,66 @@
+import asyncio
+import hashlib
 import os
 import uuid
 from datetime import datetime
 from typing import List
 
 from bson import ObjectId
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, BackgroundTasks
+from fastapi import APIRouter, Depends, File, HTTPException, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from fastapi.routing import APIRoute
 
+from app import doc_events
 from app.core.database import get_db
+from app.core import doc_cache
 from app.core.security import get_current_user
-from app.core.config import UPLOAD_DIR
-from app.document_loader import process_pdf
+from app.core.sse import sse
+from app.core.config import UPLOAD_DIR, DOC_EVENTS_KEEPALIVE
+from app.ingestion import notify, queue_delete
 from app.models.schemas import DocumentOut
-from app.rag_engine import ingest, delete_doc
-
-router = APIRouter(prefix="/api/documents", tags=["documents"])
 
 ALLOWED_EXTENSIONS = {".pdf", ".txt"}
 MAX_BYTES = 50 * 1024 * 1024  # 50 MB
+MAX_BODY_BYTES = MAX_BYTES + 64 * 1024  # file plus multipart headers
+UPLOAD_CHUNK_BYTES = 1024 * 1024  # 1 MB
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(status_code=400, detail="File too large (max 50 MB)")
+
+
+class _CappedBodyRoute(APIRoute):
+    """Rejects request bodies over MAX_BODY_BYTES as they arrive.
+
+    Starlette spools the whole multipart body before the handler runs, so a
+    limit checked in the handler would only apply once the upload finished.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def capped(request: Request):
+            length = request.headers.get("content-length", "")
+            if length.isdigit() and int(length) > MAX_BODY_BYTES:
+                raise _too_large()
+            received = 0
+
+            async def receive():
+                nonlocal received
+                message = await request.receive()
+                if message["type"] == "http.request":
+                    received += len(message.get("body", b""))
+                    if received > MAX_BODY_BYTES:
+                        raise _too_large()
+                return message
+
+            return await handler(Request(request.scope, receive))
+
+        return capped
+
+
+router = APIRouter(prefix="/api/documents", tags=["documents"], route_class=_CappedBodyRoute)
 
 
 def _doc_out(d: dict) -> DocumentOut:
@@ -26,37 +70,15 @@ def _doc_out(d: dict) -> DocumentOut:
         file_size=d["file_size"],
         pages=d.get("pages", 0),
         chunks=d.get("chunks", 0),
+        progress=doc_events.progress(d),
         status=d["status"],
         created_at=d["created_at"],
         user_id=d["user_id"],
     )
 
 
-async def _process(doc_id: str, file_path: str, user_id: str, db) -> None:
-    """Background task: parse PDF → embed → update status."""
-    try:
-        await db["documents"].update_one(
-            {"_id": ObjectId(doc_id)}, {"$set": {"status": "processing"}}
-        )
-        chunks = process_pdf(file_path)
-        ingest(chunks, user_id=user_id, doc_id=doc_id)
-
-        pages = max((c.metadata.get("page", 0) for c in chunks), default=0) + 1
-        await db["documents"].update_one(
-            {"_id": ObjectId(doc_id)},
-            {"$set": {"status": "ready", "chunks": len(chunks), "pages": pages}},
-        )
-    except Exception as e:
-        await db["documents"].update_one(
-            {"_id": ObjectId(doc_id)},
-            {"$set": {"status": "error", "error": str(e)}},
-        )
-        print(f"Document processing error: {e}")
-
-
 @router.post("/upload", response_model=DocumentOut, status_code=201)
 async def upload(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     current_user=Depends(get_current_user),
 ):
@@ -64,34 +86,55 @@ async def upload(
     if ext not in ALLOWED_EXTENSIONS:
         raise HTTPException(status_code=400, detail="Only PDF and TXT files are supported")
 
-    data = await file.read()
-    if len(data) > MAX_BYTES:
-        raise HTTPException(status_code=400, detail="File too large (max 50 MB)")
+    if file.size is not None and file.size > MAX_BYTES:
+        raise _too_large()
 
     user_dir = os.path.join(UPLOAD_DIR, current_user["id"])
     os.makedirs(user_dir, exist_ok=True)
 
     safe_name = f"{uuid.uuid4().hex}{ext}"
     file_path = os.path.join(user_dir, safe_name)
-    with open(file_path, "wb") as f:
-        f.write(data)
+
+    # Copy in fixed-size chunks, enforcing the limit and hashing as bytes arrive.
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(file_path, "wb") as f:
+            while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+                size += len(chunk)
+                if size > MAX_BYTES:
+                    raise _too_large()
+                digest.update(chunk)
+                await run_in_threadpool(f.write, chunk)
+    except BaseException:
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
+        raise
 
     db = get_db()
+    now = datetime.utcnow()
     record = {
         "user_id": current_user["id"],
         "original_name": file.filename,
         "stored_name": safe_name,
         "file_path": file_path,
-        "file_size": len(data),
+        "file_size": size,
+        "sha256": digest.hexdigest(),
         "pages": 0,
         "chunks": 0,
         "status": "pending",
-        "created_at": datetime.utcnow(),
+        "attempts": 0,
+        "next_attempt_at": now,
+        "created_at": now,
     }
     result = await db["documents"].insert_one(record)
     record["_id"] = result.inserted_id
+    doc_cache.invalidate(current_user["id"], str(result.inserted_id))
+    doc_events.publish(current_user["id"], doc_events.status_event(record))
 
-    background_tasks.add_task(_process, str(result.inserted_id), file_path, current_user["id"], db)
+    notify()  # picked up by the ingestion workers
     return _doc_out(record)
 
 
@@ -107,6 +150,65 @@ async def list_docs(current_user=Depends(get_current_user)):
     return [_doc_out(d) for d in docs]
 
 
+@router.get("/events")
+async def document_events(current_user=Depends(get_current_user)):
+    """Server-sent `status` events for all of the user's documents.
+
+    Opens with the current state of every in-flight document. While any are
+    in flight, each keep-alive also re-reads them: only the API worker that
+    holds the vector-store writer lock ingests, and its events never reach
+    the other workers.
+    """
+    user_id = current_user["id"]
+    db = get_db()
+    queue = doc_events.subscribe(user_id)  # before the snapshot, so nothing slips between
+
+    async def events():
+        watching: dict = {}  # in-flight doc id → last event sent
+
+        def track(event: dict) -> dict:
+            if event["status"] in doc_events.IN_FLIGHT:
+                watching[event["id"]] = event
+            else:
+                watching.pop(event["id"], None)
+            return event
+
+        async def reread():
+            if not watching:
+                return
+            ids = [ObjectId(i) for i in watching]
+            found = await db["documents"].find({"_id": {"$in": ids}, "user_id": user_id}).to_list(None)
+            current = {str(d["_id"]): doc_events.status_event(d) for d in found}
+            for doc_id, last in list(watching.items()):
+                event = current.get(doc_id, {"id": doc_id, "status": "deleted"})
+                if event != last:
+                    yield track(event)
+
+        try:
+            snapshot = await db["documents"].find(
+                {"user_id": user_id, "status": {"$in": list(doc_events.IN_FLIGHT)}}
+            ).to_list(200)
+            for d in snapshot:
+                yield sse("status", track(doc_events.status_event(d)))
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=DOC_EVENTS_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    async for event in reread():
+                        yield sse("status", event)
+                    yield ": keep-alive\n\n"
+                    continue
+                yield sse("status", track(event))
+        finally:
+            doc_events.unsubscribe(user_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/{doc_id}", response_model=DocumentOut)
 async def get_doc(doc_id: str, current_user=Depends(get_current_user)):
     db = get_db()
@@ -127,8 +229,8 @@ async def delete_document(doc_id: str, current_user=Depends(get_current_user)):
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
 
-    # Remove vectors
-    delete_doc(user_id=current_user["id"], doc_id=doc_id)
+    # Remove vectors (done by the process that writes the vector store)
+    await queue_delete(db, current_user["id"], doc_id)
 
     # Remove file from disk
     try:
@@ -138,3 +240,5 @@ async def delete_document(doc_id: str, current_user=Depends(get_current_user)):
         pass
 
     await db["documents"].delete_one({"_id": ObjectId(doc_id)})
+    doc_cache.invalidate(current_user["id"], doc_id)
+    doc_events.publish(current_user["id"], {"id": doc_id, "status": "deleted"})
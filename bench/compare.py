@@ -0,0 +1,58 @@
+"""Compare two benchmark result files and flag regressions.
+
+    python -m bench.compare baseline.json candidate.json [--tolerance 0.10]
+
+Exits 1 when any tracked metric is worse than the baseline by more than
+the tolerance (default 10%).
+"""
+import argparse
+import json
+import sys
+
+# (section, metric, True if higher is better)
+METRICS = [
+    ("ingest", "pages_per_s", True),
+    ("ingest", "chunks_per_s", True),
+    ("query", "throughput_rps", True),
+    ("query", "p50_ms", False),
+    ("query", "p95_ms", False),
+    ("query", "p99_ms", False),
+]
+
+
+def compare(old: dict, new: dict, tolerance: float) -> list:
+    regressions = []
+    for section, metric, higher_better in METRICS:
+        a, b = old.get(section, {}).get(metric), new.get(section, {}).get(metric)
+        if a is None or b is None or a == 0:
+            continue
+        change = (b - a) / a
+        worse = -change if higher_better else change
+        flag = "REGRESSION" if worse > tolerance else ""
+        print(f"{section}.{metric:<16} {a:>10} → {b:<10} {change:+.1%} {flag}")
+        if flag:
+            regressions.append(f"{section}.{metric}")
+    for stage, mem in new.get("memory", {}).items():
+        before = old.get("memory", {}).get(stage, {}).get("peak_rss_mb")
+        print(f"memory.{stage:<15} peak RSS {before} → {mem.get('peak_rss_mb')} MB")
+    return regressions
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args(argv)
+    with open(args.baseline) as f:
+        old = json.load(f)
+    with open(args.candidate) as f:
+        new = json.load(f)
+    regressions = compare(old, new, args.tolerance)
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Deterministic synthetic corpora (PDF and TXT) for the benchmarks."""
+import os
+import random
+
+_WORDS = (
+    "policy employee manager leave request approval onboarding laptop security "
+    "access badge expense report travel reimbursement contract vendor invoice "
+    "quarterly review compliance training deadline benefits insurance holiday "
+    "remote office equipment procedure escalation incident support warranty "
+    "maintenance schedule inspection safety handbook section appendix revision"
+).split()
+
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(_WORDS) for _ in range(rng.randint(8, 18))]
+    if rng.random() < 0.2:
+        words.insert(rng.randrange(len(words)), f"{rng.choice('ABCDEFGH')}{rng.choice('QRSTUVWX')}-{rng.randint(1000, 9999)}")
+    return " ".join(words).capitalize() + "."
+
+
+def page_lines(rng: random.Random, lines: int = 45) -> list:
+    return [_sentence(rng) for _ in range(lines)]
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: list) -> None:
+    """Write a minimal, valid text PDF: one page per list of lines."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in below
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for lines in pages:
+        body = ["BT", "/F1 9 Tf", "11 TL", "40 800 Td"]
+        body += [f"({_pdf_escape(line[:110])}) '" for line in lines]
+        body.append("ET")
+        stream = "\n".join(body).encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_ref = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids), len(kids)
+    )
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + obj + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def build_corpus(directory: str, docs: int, pages: int, txt_ratio: float = 0.25, seed: int = 7) -> list:
+    """Create `docs` files of `pages` pages each; returns their paths."""
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for n in range(docs):
+        content = [page_lines(rng) for _ in range(pages)]
+        if rng.random() < txt_ratio:
+            path = os.path.join(directory, f"doc_{n:03d}.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("\n\n".join("\n".join(lines) for lines in content))
+        else:
+            path = os.path.join(directory, f"doc_{n:03d}.pdf")
+            write_pdf(path, content)
+        paths.append(path)
+    return paths
+
+
+def questions(count: int, seed: int = 11) -> list:
+    rng = random.Random(seed)
+    return [
+        f"What does the {rng.choice(_WORDS)} {rng.choice(_WORDS)} say about {rng.choice(_WORDS)}?"
+        for _ in range(count)
+    ]
@@ -0,0 +1,75 @@
+"""Local stand-ins for MongoDB Atlas, Groq and the embedding model."""
+import asyncio
+import hashlib
+import random
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+
+class FakeChatGroq:
+    """Deterministic ChatGroq replacement with a fixed simulated latency."""
+
+    def __init__(self, latency: float = 0.2, tokens: int = 60):
+        self.latency = latency
+        self.tokens = tokens
+        self.calls = 0
+
+    def _answer(self, messages) -> str:
+        digest = hashlib.sha256(messages[-1].content.encode("utf-8")).hexdigest()
+        words = [digest[i % 64:i % 64 + 6] for i in range(self.tokens)]
+        return " ".join(words)
+
+    def invoke(self, messages):
+        import time
+        self.calls += 1
+        time.sleep(self.latency)
+        return AIMessage(content=self._answer(messages))
+
+    async def ainvoke(self, messages):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return AIMessage(content=self._answer(messages))
+
+    async def astream(self, messages):
+        self.calls += 1
+        words = self._answer(messages).split(" ")
+        for word in words:
+            await asyncio.sleep(self.latency / len(words))
+            yield AIMessageChunk(content=word + " ")
+
+
+class FakeEmbeddingBackend:
+    """Deterministic unit vectors per text; counts every text it embeds."""
+    name = "fake"
+    model_name = "fake"
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self.model = "fake"
+        self.texts = 0
+
+    def load(self) -> None:
+        pass
+
+    def embed(self, texts: list) -> list:
+        self.texts += len(texts)
+        vectors = []
+        for text in texts:
+            rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+            vec = [rng.gauss(0, 1) for _ in range(self.dim)]
+            norm = sum(x * x for x in vec) ** 0.5
+            vectors.append([x / norm for x in vec])
+        return vectors
+
+
+async def connect_mock_db() -> None:
+    """Drop-in for app.core.database.connect_db backed by mongomock-motor."""
+    from mongomock_motor import AsyncMongoMockClient
+    from app.core import database
+
+    database._client = AsyncMongoMockClient()
+    database._db = database._client["AiAssistant"]
+    db = database._db
+    await db["users"].create_index("email", unique=True)
+    await db["users"].create_index("username", unique=True)
+    await db["chat_messages"].create_index([("session_id", 1), ("seq", 1)], unique=True)
@@ -0,0 +1,116 @@
+"""Vector store layout benchmark: per-user directories vs hashed shards.
+
+    python -m bench.layouts --users 500 --chunks 100 --shards 16 --output layouts.json
+
+Fills both layouts with the same synthetic users (random unit vectors, so no
+embedding model is loaded), then simulates a restart and measures the first
+scoped query for every user — the cold-open cost — plus the files and bytes
+each layout leaves on disk.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+from datetime import datetime
+
+from bench.run import _percentiles
+
+
+def _unit(rng: random.Random, dim: int) -> list:
+    vec = [rng.gauss(0, 1) for _ in range(dim)]
+    norm = sum(x * x for x in vec) ** 0.5
+    return [x / norm for x in vec]
+
+
+def _footprint(path: str) -> dict:
+    files, size = 0, 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            files += 1
+            size += os.path.getsize(os.path.join(root, name))
+    return {"files": files, "mb": round(size / 2**20, 1)}
+
+
+def _run_layout(layout: str, args) -> dict:
+    from app import rag_engine
+
+    rag_engine.VECTOR_STORE_LAYOUT = layout
+    rag_engine.VECTOR_SHARDS = args.shards
+    rng = random.Random(args.seed)
+    users = [f"bench{i:05d}" for i in range(args.users)]
+
+    started = time.perf_counter()
+    for uid in users:
+        doc_id = f"{uid}doc"
+        with rag_engine._store(uid, write=True) as store:
+            store._collection.upsert(
+                ids=[f"{doc_id}:{n}" for n in range(args.chunks)],
+                embeddings=[_unit(rng, args.dim) for _ in range(args.chunks)],
+                metadatas=[
+                    {"user_id": uid, "doc_id": doc_id, "chunk_hash": f"{uid}-{n}"} for n in range(args.chunks)
+                ],
+                documents=[f"chunk {n} of {uid}" for n in range(args.chunks)],
+            )
+    fill_seconds = time.perf_counter() - started
+    rag_engine.close_stores()
+
+    # Restart: every store is closed; users arrive in random order.
+    order = users[:]
+    rng.shuffle(order)
+    latencies = []
+    for uid in order:
+        t0 = time.perf_counter()
+        with rag_engine._store(uid) as store:
+            res = store._collection.query(
+                query_embeddings=[_unit(rng, args.dim)], n_results=5, where={"user_id": uid}, include=[]
+            )
+        latencies.append(time.perf_counter() - t0)
+        assert all(cid.startswith(uid) for cid in res["ids"][0]), "cross-tenant hit"
+    rag_engine.close_stores()
+
+    return {
+        "fill_seconds": round(fill_seconds, 2),
+        "first_query": _percentiles(latencies),
+        "disk": _footprint(rag_engine.CHROMA_DIR),
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--chunks", type=int, default=50, help="chunks per user")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default="bench_layouts.json")
+    parser.add_argument("--workdir", help="keep data here instead of a temporary directory")
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.output)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="docmind-layouts-")
+    results = {}
+    for layout in ("per_user", "sharded"):
+        path = os.path.join(workdir, layout)
+        os.makedirs(path, exist_ok=True)
+        os.chdir(path)  # CHROMA_DIR is a relative path
+        results[layout] = _run_layout(layout, args)
+        print(layout, json.dumps(results[layout]))
+
+    results["config"] = vars(args)
+    results["env"] = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "workdir": workdir,
+    }
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""Offline benchmark: ingest throughput, chat query latency and memory per stage.
+
+    pip install -r requirements.txt -r bench/requirements.txt
+    python -m bench.run --docs 20 --pages 30 --queries 200 --concurrency 16 --output bench/results.json
+
+The FastAPI app runs in-process against mongomock-motor and a deterministic
+fake ChatGroq, inside a throwaway working directory (uploads, Chroma and
+lexical indexes all land there), so no Atlas cluster or Groq key is needed.
+Compare two result files with `python -m bench.compare old.json new.json`.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return 0.0
+
+
+def _peak_rss_mb(who=resource.RUSAGE_SELF) -> float:
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def _parse_pool_peak_mb() -> float:
+    """Largest peak RSS among parse-pool processes, live (VmHWM) or already reaped."""
+    from app import ingestion
+
+    peak = _peak_rss_mb(resource.RUSAGE_CHILDREN)
+    for pid in getattr(ingestion._parse_pool, "_processes", None) or {}:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        peak = max(peak, int(line.split()[1]) / 1024)
+        except (OSError, ValueError):
+            pass
+    return peak
+
+
+class _Stage:
+    """Records wall time and RSS (ours and the parse pool's) for one benchmark stage.
+
+    With `trace_heap`, the Python heap peak is traced too — only inside the
+    stage, and at a cost that shows up in its timings.
+    """
+
+    def __init__(self, name: str, memory: dict, trace_heap: bool = False):
+        self.name = name
+        self.memory = memory
+        self.trace_heap = trace_heap
+
+    def __enter__(self):
+        if self.trace_heap:
+            tracemalloc.start()
+        self.rss_before = _rss_mb()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self.started
+        self.memory[self.name] = {
+            "rss_before_mb": round(self.rss_before, 1),
+            "rss_after_mb": round(_rss_mb(), 1),
+            "peak_rss_mb": round(_peak_rss_mb(), 1),
+            "parse_pool_peak_rss_mb": round(_parse_pool_peak_mb(), 1),
+            "seconds": round(self.seconds, 3),
+        }
+        if self.trace_heap:
+            self.memory[self.name]["py_heap_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+            tracemalloc.stop()
+
+
+def _percentiles(samples: list) -> dict:
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        "p50_ms": round(1000 * pct(50), 1),
+        "p95_ms": round(1000 * pct(95), 1),
+        "p99_ms": round(1000 * pct(99), 1),
+        "mean_ms": round(1000 * statistics.fmean(ordered), 1),
+        "max_ms": round(1000 * ordered[-1], 1),
+    }
+
+
+async def _run(args) -> dict:
+    import httpx
+
+    from bench import corpus
+    from bench.fakes import FakeChatGroq, connect_mock_db
+    import app.main as app_main
+    from app import llm_gateway
+
+    app_main.connect_db = connect_mock_db
+    llm_gateway._llm = FakeChatGroq(latency=args.llm_latency)
+    memory: dict = {}
+
+    with _Stage("corpus", memory, args.trace_heap):
+        paths = corpus.build_corpus("corpus", args.docs, args.pages, seed=args.seed)
+
+    transport = httpx.ASGITransport(app=app_main.app)
+    async with app_main.app.router.lifespan_context(app_main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+            with _Stage("startup", memory, args.trace_heap):
+                while (await client.get("/health")).status_code != 200:
+                    await asyncio.sleep(0.1)
+
+            r = await client.post("/api/auth/register", json={
+                "username": "bench", "email": "bench@example.com", "password": "bench-password",
+            })
+            r.raise_for_status()
+            client.headers["Authorization"] = f"Bearer {r.json()['access_token']}"
+
+            # ── Ingest ────────────────────────────────────────────────────────
+            with _Stage("ingest", memory, args.trace_heap) as stage:
+                for path in paths:
+                    with open(path, "rb") as f:
+                        r = await client.post("/api/documents/upload", files={"file": (os.path.basename(path), f)})
+                    r.raise_for_status()
+                while True:
+                    docs = (await client.get("/api/documents/")).json()
+                    if all(d["status"] in ("ready", "error") for d in docs):
+                        break
+                    await asyncio.sleep(0.2)
+            pages = sum(d["pages"] for d in docs)
+            chunks = sum(d["chunks"] for d in docs)
+            ingest = {
+                "documents": len(docs),
+                "failed": sum(d["status"] == "error" for d in docs),
+                "pages": pages,
+                "chunks": chunks,
+                "seconds": round(stage.seconds, 3),
+                "pages_per_s": round(pages / stage.seconds, 2),
+                "chunks_per_s": round(chunks / stage.seconds, 2),
+            }
+
+            # ── Query ─────────────────────────────────────────────────────────
+            questions = corpus.questions(args.queries if args.distinct else max(args.queries // 10, 1), seed=args.seed)
+            doc_ids = [d["id"] for d in docs if d["status"] == "ready"]
+            sem = asyncio.Semaphore(args.concurrency)
+            latencies, errors = [], 0
+
+            async def one(i: int):
+                nonlocal errors
+                body = {"question": questions[i % len(questions)]}
+                if args.scoped:
+                    body["document_ids"] = doc_ids[i % len(doc_ids):i % len(doc_ids) + 3]
+                async with sem:
+                    t0 = time.perf_counter()
+                    r = await client.post("/api/chat/query", json=body)
+                    elapsed = time.perf_counter() - t0
+                if r.status_code == 200:
+                    latencies.append(elapsed)
+                else:
+                    errors += 1
+
+            with _Stage("query", memory, args.trace_heap) as stage:
+                await asyncio.gather(*(one(i) for i in range(args.queries)))
+            query = {
+                "requests": args.queries,
+                "concurrency": args.concurrency,
+                "errors": errors,
+                "throughput_rps": round(len(latencies) / stage.seconds, 2),
+                "llm_calls": llm_gateway._llm.calls,
+                **_percentiles(latencies),
+            }
+
+    return {"ingest": ingest, "query": query, "memory": memory}
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=20, help="pages per document")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="simulated Groq latency (s)")
+    parser.add_argument("--distinct", action="store_true", help="never repeat a question (defeats the answer cache)")
+    parser.add_argument("--scoped", action="store_true", help="send document_ids with each query")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--workdir", help="keep data here instead of a temporary directory")
+    parser.add_argument(
+        "--trace-heap", action="store_true", help="also record Python heap peaks (slows every stage; skip for latency runs)"
+    )
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.output)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="docmind-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)  # UPLOAD_DIR / CHROMA_DIR are relative paths
+
+    results = asyncio.run(_run(args))
+    results["config"] = vars(args)
+    results["env"] = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "workdir": workdir,
+    }
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps({k: results[k] for k in ("ingest", "query")}, indent=2))
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+// Server-sent events over fetch, so the JWT can travel in the Authorization
+// header (EventSource can't set headers). Reconnects with backoff until closed.
+export function subscribe(path, onEvent) {
+  let closed = false;
+  let controller = null;
+  let delay = 1000;
+
+  const connect = async () => {
+    controller = new AbortController();
+    try {
+      const res = await fetch(`/api${path}`, {
+        headers: { Authorization: `Bearer ${localStorage.getItem("token")}` },
+        signal: controller.signal,
+      });
+      if (res.status === 401) {
+        localStorage.removeItem("token");
+        window.location.href = "/login";
+        return;
+      }
+      if (!res.ok) throw new Error(`HTTP ${res.status}`);
+      delay = 1000;
+
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let end;
+        while ((end = buffer.indexOf("\n\n")) !== -1) {
+          const block = buffer.slice(0, end);
+          buffer = buffer.slice(end + 2);
+          let event = "message", data = "";
+          for (const line of block.split("\n")) {
+            if (line.startsWith("event: ")) event = line.slice(7);
+            else if (line.startsWith("data: ")) data += line.slice(6);
+          }
+          if (data) onEvent(event, JSON.parse(data));
+        }
+      }
+    } catch {
+      if (closed) return;
+    }
+    if (!closed) {
+      setTimeout(connect, delay);
+      delay = Math.min(delay * 2, 30000);
+    }
+  };
+
+  connect();
+  return () => { closed = true; controller?.abort(); };
+}
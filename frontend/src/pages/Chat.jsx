@@ -15,6 +15,7 @@ export default function Chat() {
   const [selDocs,  setSelDocs]    = useState([]);
   const [input,    setInput]      = useState("");
   const [sending,  setSending]    = useState(false);
+  const [cursor,   setCursor]     = useState(null);
   const endRef  = useRef(null);
   const taRef   = useRef(null);
 
@@ -30,10 +31,20 @@ export default function Chat() {
     try {
       const s = await api.get(`/chat/sessions/${id}`);
       setMessages(s.messages || []);
+      setCursor(s.next_cursor);
     } catch { toast.error("Failed to load chat"); }
   };
 
-  const newChat = () => { setActiveId(null); setMessages([]); };
+  const loadEarlier = async () => {
+    if (!activeId || cursor == null) return;
+    try {
+      const s = await api.get(`/chat/sessions/${activeId}`, { params: { before: cursor } });
+      setMessages((p) => [...(s.messages || []), ...p]);
+      setCursor(s.next_cursor);
+    } catch { toast.error("Failed to load earlier messages"); }
+  };
+
+  const newChat = () => { setActiveId(null); setMessages([]); setCursor(null); };
 
   const send = async () => {
     if (!input.trim() || sending) return;
@@ -169,6 +180,11 @@ export default function Chat() {
             </div>
           ) : (
             <>
+              {cursor != null && (
+                <div className="flex justify-center">
+                  <button onClick={loadEarlier} className="btn-ghost btn-sm">Load earlier messages</button>
+                </div>
+              )}
               {messages.map((msg, i) => (
                 <ChatBubble key={i} msg={msg} userInitials={userInitials} />
               ))}
@@ -6,6 +6,7 @@ import Badge from "../components/ui/Badge";
 import Empty from "../components/ui/Empty";
 import { formatBytes, timeAgo } from "../lib/utils";
 import api from "../lib/api";
+import { subscribe } from "../lib/events";
 
 export default function Documents() {
   const [docs,     setDocs]     = useState([]);
@@ -13,7 +14,9 @@ export default function Documents() {
   const [uploading,setUploading]= useState(false);
   const [progress, setProgress] = useState(0);
   const [search,   setSearch]   = useState("");
-  const polls = useRef({});
+  const docsRef = useRef([]);
+  const early   = useRef({});  // updates that beat their upload response
+  docsRef.current = docs;
 
   const fetchDocs = useCallback(async () => {
     setLoading(true);
@@ -24,27 +27,27 @@ export default function Documents() {
 
   useEffect(() => {
     fetchDocs();
-    return () => Object.values(polls.current).forEach(clearInterval);
-  }, []);
-
-  const poll = (id) => {
-    if (polls.current[id]) return;
-    polls.current[id] = setInterval(async () => {
-      try {
-        const doc = await api.get(`/documents/${id}`);
-        setDocs((prev) => prev.map((d) => (d.id === id ? doc : d)));
-        if (doc.status === "ready") {
-          clearInterval(polls.current[id]);
-          delete polls.current[id];
-          toast.success(`"${doc.original_name}" is ready!`);
-        } else if (doc.status === "error") {
-          clearInterval(polls.current[id]);
-          delete polls.current[id];
-          toast.error(`Failed to process "${doc.original_name}"`);
+    // One stream for every document's status changes.
+    return subscribe("/documents/events", (event, update) => {
+      if (event !== "status") return;
+      if (update.status === "deleted") {
+        setDocs((prev) => prev.filter((d) => d.id !== update.id));
+        return;
+      }
+      const doc = docsRef.current.find((d) => d.id === update.id);
+      if (doc && doc.status !== update.status) {
+        if (update.status === "ready") toast.success(`"${doc.original_name}" is ready!`);
+        else if (update.status === "error") toast.error(`Failed to process "${doc.original_name}"`);
+      }
+      setDocs((prev) => {
+        if (!prev.some((d) => d.id === update.id)) {
+          early.current[update.id] = { ...early.current[update.id], ...update };
+          return prev;
         }
-      } catch { clearInterval(polls.current[id]); }
-    }, 3000);
-  };
+        return prev.map((d) => (d.id === update.id ? { ...d, ...update } : d));
+      });
+    });
+  }, []);
 
   const uploadFile = async (file) => {
     if (!/\.(pdf|txt)$/i.test(file.name)) { toast.error("Only PDF and TXT files are supported"); return; }
@@ -56,10 +59,11 @@ export default function Documents() {
       const form = new FormData();
       form.append("file", file);
       const doc = await api.post("/documents/upload", form, { headers: { "Content-Type": "multipart/form-data" } });
-      setDocs((prev) => [doc, ...prev]);
+      const update = early.current[doc.id];
+      delete early.current[doc.id];
+      setDocs((prev) => [{ ...doc, ...update }, ...prev]);
       setProgress(100);
       toast.success(`"${file.name}" uploaded – processing…`);
-      poll(doc.id);
     } catch (ex) {
       toast.error(ex.message);
     } finally {
@@ -196,9 +200,9 @@ function DocCard({ doc, onDelete }) {
       {doc.status === "processing" && (
         <div className="mt-3">
           <div className="h-1 bg-surface-600 rounded-full overflow-hidden">
-            <div className="h-full w-1/2 bg-brand-500 rounded-full animate-pulse" />
+            <div className="h-full bg-brand-500 rounded-full animate-pulse transition-all duration-300" style={{ width: `${Math.max(doc.progress || 0, 5)}%` }} />
           </div>
-          <p className="text-[11px] text-amber-400 mt-1.5">Indexing…</p>
+          <p className="text-[11px] text-amber-400 mt-1.5">Indexing… {doc.progress > 0 && `${doc.progress}%`}</p>
         </div>
       )}
 
@@ -7,4 +7,5 @@ if __name__ == "__main__":
         "app.main:app",
         host="0.0.0.0",   
         port=port,
+        workers=int(os.environ.get("WEB_CONCURRENCY", 1)),
     )
\ No newline at end of file